@@ -0,0 +1,103 @@
+from argparse import ArgumentParser
+from pathlib import Path
+from time import perf_counter, strftime
+from typing import Dict, List, Tuple
+import json
+import platform
+import tracemalloc
+from fast_compiler import ENGINES, ENGINE_VERSION, execute
+from instruments import Profile
+
+
+# Loads every programme in the benchmark directory, along with its inputs if a .in file with the same name exists
+def load_benchmarks(directory: Path, names: List[str] | None = None) -> Dict[str, Tuple[str, bytes]]:
+    benchmarks = {}
+    for path in sorted(directory.glob("*.b")):
+        if names and path.stem not in names:
+            continue
+        inputs_path = path.with_suffix(".in")
+        inputs = inputs_path.read_bytes() if inputs_path.exists() else b""
+        benchmarks[path.stem] = (path.read_text(), inputs)
+    return benchmarks
+
+
+# Times a programme on an engine, taking the best of several warm runs, then measures its peak memory on a separate traced run if asked to
+# Tracing allocations slows the interpreter down by up to a hundred times on the longer workloads, so it is left out by default
+def run_benchmark(bf: str, inputs: bytes, engine: str, ops: int, repeat: int, memory: bool = False) -> Dict[str, float | int | str | None]:
+    run = ENGINES[engine]
+    try:
+        run(bf, inputs)
+        wall = float("inf")
+        for _ in range(repeat):
+            st = perf_counter()
+            run(bf, inputs)
+            wall = min(wall, perf_counter() - st)
+
+        peak = None
+        if memory:
+            tracemalloc.start()
+            run(bf, inputs)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return {"wall": wall, "ops_per_sec": ops / wall if wall else None, "peak_memory": peak}
+
+
+# Runs every benchmark on every engine, counting the compiled ops each programme executes so engines can be compared by ops/sec
+def run_suite(benchmarks: Dict[str, Tuple[str, bytes]], engines: List[str], repeat: int, memory: bool = False) -> Dict:
+    results = {
+        "engine_version": ENGINE_VERSION,
+        "python": platform.python_version(),
+        "time": strftime("%Y-%m-%dT%H:%M:%S"),
+        "benchmarks": {},
+    }
+    for name, (bf, inputs) in benchmarks.items():
+        profile = Profile()
+        try:
+            execute(bf, inputs, profile=profile)
+        except Exception:
+            pass
+        ops = int(profile.ops.sum())
+        results["benchmarks"][name] = {"ops": ops, "engines": {}}
+        for engine in engines:
+            result = run_benchmark(bf, inputs, engine, ops, repeat, memory)
+            results["benchmarks"][name]["engines"][engine] = result
+            print(format_result(name, engine, result))
+    return results
+
+
+def format_result(name: str, engine: str, result: Dict) -> str:
+    if "error" in result:
+        return f"{name:<20}{engine:<14}{result['error']}"
+    memory = f"{result['peak_memory'] / 1024:>12,.0f} KiB" if result["peak_memory"] is not None else ""
+    return f"{name:<20}{engine:<14}{result['wall']:>10.4f}s{result['ops_per_sec'] or 0:>16,.0f} ops/s{memory}"
+
+
+# Prints how each result changed against a previous results file, where a ratio above 1 is a slowdown
+def compare(results: Dict, previous: Dict) -> None:
+    print(f"\nCompared to engine version {previous['engine_version']} ({previous['time']}):")
+    for name, benchmark in results["benchmarks"].items():
+        for engine, result in benchmark["engines"].items():
+            old = previous["benchmarks"].get(name, {}).get("engines", {}).get(engine)
+            if not old or "wall" not in old or "wall" not in result:
+                continue
+            memory = f"{result['peak_memory'] / max(old['peak_memory'], 1):>10.2f}x memory" if result["peak_memory"] is not None and old.get("peak_memory") is not None else ""
+            print(f"{name:<20}{engine:<14}{result['wall'] / old['wall']:>10.2f}x wall{memory}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Runs the BrainFunc benchmark suite and saves the results as JSON")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, defaults to all of them")
+    parser.add_argument("--directory", type=Path, default=Path(__file__).parent / "benchmarks")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=Path("bench_results.json"))
+    parser.add_argument("--compare", type=Path, help="previous results file to compare against")
+    parser.add_argument("--memory", action="store_true", help="also measures peak memory with tracemalloc, on a run which is many times slower")
+    options = parser.parse_args()
+
+    results = run_suite(load_benchmarks(options.directory, options.names), options.engines, options.repeat, options.memory)
+    options.output.write_text(json.dumps(results, indent=4))
+    if options.compare:
+        compare(results, json.loads(options.compare.read_text()))
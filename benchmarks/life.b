@@ -0,0 +1 @@
+>>>>>>>>>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>+>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>+>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>+>>>>>+>+>>+>>>>>+>+>>+>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>+>>>>>+>+>>+>>>>>+>+>>+>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>+>>>>>+>+>>+>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>+>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>>>>>>>+>+>+>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+>>>>>>>>+<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++[->>[>>>[-<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<+>>>>>>>>+>>>>>>>>+>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>+>>>>>>>>>+>>>>>>>+>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>+>>>>>>>>+>>>>>>>>+<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<]>>[-<<+>>]<<<<<>>>>>>>>]<<<<<<<<[<<<<<<<<]>>>>>>>>[>>>>[->++<]<[->>+<<]<<[->>>>>+>+<<<<<<]>>>>>>[-<<<<<<+>>>>>>]+<[[-]>-<]>[[-]<<[-]>>]<<[->+<<+>]<[->+<]>>----->+<[[-]>-<]>[-<<<<+>>>>]<<[->+<<+>]<[->+<]>>------>+<[[-]>-<]>[-<<<<+>>>>]<<[->+<<+>]<[->+<]>>------->+<[[-]>-<]>[-<<<<+>>>>]<<[-]<<<<<>>>>>>>>]<<<<<<<<[<<<<<<<<]>>>>>>>><<]>>[>[->>>>>+>+<<<<<<]>>>>>>[-<<<<<<+>>>>>>]<[[-]<++++++++++++++++++++++++++++++++++++++++++++++<<[->>-----------<<]>>.[-]>]<<<<[->>>>+>+<<<<<]>>>>>[-<<<<<+>>>>>]<[[-]<++++++++++.[-]>]<<<<<<>>>>>>>>]<<<<<<<<[<<<<<<<<]>>>>>>>>
\ No newline at end of file
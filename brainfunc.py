@@ -0,0 +1,159 @@
+from argparse import ArgumentParser, Namespace
+from time import perf_counter
+from typing import BinaryIO, Iterator
+from mmap import mmap, ACCESS_READ
+import os
+import stat
+import sys
+from fast_compiler import ENGINES, MAX_DEPTH, ByteOutputs, execute_stream
+
+
+# Inputs are read in chunks of up to this size, though a chunk is taken as soon as anything is available so interactive input isn't held up
+CHUNK_SIZE = 65536
+
+# Every byte an output can be, so writing one doesn't allocate
+BYTES = [bytes((i,)) for i in range(256)]
+
+
+# Streams top level inputs from a binary file as the programme asks for them
+# Outputs are flushed before each read, so anything the programme printed before asking is shown before it blocks
+def read_inputs(source: BinaryIO, sink: BinaryIO) -> Iterator[int]:
+    while True:
+        sink.flush()
+        chunk = source.read1(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield from chunk
+
+
+# Writes each output as a raw byte, with functions written as f followed by the position they start at like the IDE shows them
+def write_outputs(outputs: Iterator, sink: BinaryIO) -> int:
+    count = 0
+    for value in outputs:
+        sink.write(BYTES[value] if isinstance(value, int) else f"f{value[0]}".encode())
+        count += 1
+    return count
+
+
+# Writes the bytes collected by an engine in one go, splicing in the functions from the side channel where they were output
+def write_buffer(outputs: ByteOutputs, sink: BinaryIO) -> int:
+    data = outputs.view()
+    start = 0
+    for offset, value in outputs.functions:
+        sink.write(data[start:offset])
+        sink.write(f"f{value[0]}".encode())
+        start = offset
+    sink.write(data[start:])
+    data.release()
+    return len(outputs)
+
+
+# Maps an input file into memory so engines read it in place
+# Anything which can't be mapped, like an empty file, a device such as /dev/null or a pipe, is read in full instead
+def map_inputs(path: str) -> mmap | bytes:
+    with open(path, "rb") as f:
+        if stat.S_ISREG(os.fstat(f.fileno()).st_mode):
+            try:
+                return mmap(f.fileno(), 0, access=ACCESS_READ)
+            except (OSError, ValueError):
+                pass
+        return f.read()
+
+
+# Whether the programme can ever ask for a top level input, as a , inside a function body reads its arguments and one after the | of a call reads its returns
+def reads_inputs(bf: str) -> bool:
+    depth = 0
+    calls = []
+    for c in bf:
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+        elif c == "(":
+            calls.append(False)
+        elif c == "|" and calls:
+            calls[-1] = True
+        elif c == ")" and calls:
+            calls.pop()
+        elif c == "," and not depth and not any(calls):
+            return True
+    return False
+
+
+# Runs the programme, returning the exit code
+# The interpreter streams inputs and outputs as the programme runs, while the other engines read every input up front and write once finished
+# stdin is only read when the programme can ask for a top level input, so the other engines don't wait on it for programmes which never will
+# An input file is mapped into memory rather than read, and the other engines collect their outputs in a ByteOutputs
+# Whatever was output before an error is still written before the error is reported, whichever engine ran
+def main(options: Namespace) -> int:
+    if options.source == "-":
+        bf = sys.stdin.buffer.read().decode(errors="replace")
+    else:
+        with open(options.source, encoding="utf-8", errors="replace") as f:
+            bf = f.read()
+    reading = reads_inputs(bf)
+    source = None
+    sink = sys.stdout.buffer
+
+    engine = options.engine
+    profile = None
+    if options.profile:
+        from instruments import Profile
+        profile = Profile()
+
+    count = None
+    collected = None
+    st = perf_counter()
+    try:
+        if reading and options.input is not None:
+            source = map_inputs(options.input)
+            inputs = source
+        elif reading and options.source != "-":
+            inputs = read_inputs(sys.stdin.buffer, sink) if engine == "interpreter" else sys.stdin.buffer.read()
+        else:
+            inputs = b""
+        if engine == "interpreter":
+            count = write_outputs(execute_stream(bf, inputs, profile=profile, max_depth=options.max_depth), sink)
+        else:
+            collected = ByteOutputs()
+            count = write_buffer(ENGINES[engine](bf, inputs, outputs=collected), sink)
+        sink.flush()
+    except BrokenPipeError:
+        return 0
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        if collected is not None and count is None:
+            count = write_buffer(collected, sink)
+        sink.flush()
+        position = getattr(e, "position", None)
+        print(f"{type(e).__name__}: {e}" + (f" at position {position}" if position is not None else ""), file=sys.stderr)
+        return 1
+    finally:
+        if isinstance(source, mmap):
+            source.close()
+        elapsed = perf_counter() - st
+        if profile is not None:
+            with open(options.profile, "w") as f:
+                f.write(profile.to_json())
+        if options.stats:
+            ops = f", {int(profile.ops.sum()):,} ops" if profile is not None else ""
+            outputs = f", {count:,} outputs" if count is not None else ""
+            print(f"{engine}: {elapsed:.4f}s{ops}{outputs}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(prog="python -m brainfunc", description="Runs a BrainFunc programme without the IDE, reading inputs from stdin and writing outputs to stdout as raw bytes")
+    parser.add_argument("source", nargs="?", default="-", help="file to run, or - (the default) to read the programme itself from stdin")
+    parser.add_argument("--input", help="file to read inputs from instead of stdin, which is the only way to give inputs to a programme read from stdin")
+    parser.add_argument("--engine", default="interpreter", choices=list(ENGINES))
+    parser.add_argument("--profile", metavar="FILE", help="counts what ran and saves it to FILE as JSON, on the interpreter only")
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH, help="deepest function calls can nest before the programme is stopped, on the interpreter only")
+    parser.add_argument("--stats", action="store_true", help="prints the engine used, time taken and number of outputs to stderr")
+    options = parser.parse_args()
+    if options.engine != "interpreter" and options.profile:
+        parser.error("--profile only works with --engine interpreter")
+    if options.engine != "interpreter" and options.max_depth != MAX_DEPTH:
+        parser.error("--max-depth only works with --engine interpreter")
+    sys.exit(main(options))
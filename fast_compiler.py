@@ -1,7 +1,23 @@
+from __future__ import annotations
 from time import time
-import numpy as np
-from collections import deque
-from typing import Tuple, List, Dict
+from collections import deque, OrderedDict
+from importlib.util import find_spec, MAGIC_NUMBER
+from mmap import mmap
+import os
+import re
+import marshal
+from typing import Tuple, List, Dict, Callable, Iterable, Iterator, AsyncIterable, TYPE_CHECKING
+
+# Heavier modules are only imported by the features which use them, so running a programme starts quickly
+# NumPy is needed by the instruments and the numba engine, asyncio by execute_async and multiprocessing by execute_many
+if TYPE_CHECKING:
+    import asyncio
+    import numpy as np
+    from instruments import Profile, Trace, Checkpointer
+
+# Numba is optional, without it pure brainfuck runs on the interpreter like everything else
+# Only whether it is installed is checked here, as importing it is slow and only needed once a program is run on it
+numba_installed = find_spec("numba") is not None
 
 
 # Finds matching pairs of brackets/braces or any other given pair of chars in a string
@@ -18,127 +34,1126 @@ def build_brace_map(bf: str, braces: Tuple[str, str]) -> Dict[int, int]:
     return brace_map
 
 
+# Version of the compiler, which must be bumped whenever the opcodes or optimisations change so cached programs are recompiled
+ENGINE_VERSION = 8
+
+
+# Identifies a program compiled as the given kind of op stream by the current engine version
+# The bytecode magic number is included too, as marshalled code objects can only be loaded by the python version which wrote them
+def program_digest(kind: str, bf: str) -> str:
+    import hashlib
+    return hashlib.sha256(f"{ENGINE_VERSION}:{MAGIC_NUMBER.hex()}:{kind}:{bf}".encode()).hexdigest()
+
+# Opcodes of the compiled instruction stream, numbered roughly by how often they are dispatched
+ADD, MOVE, OPEN, CLOSE, CLEAR, MULTIPLY, SCAN, OUTPUT, INPUT, FUNC, RET, CALL, ARGS, END_CALL, TRAP = range(15)
+
+# Maps every command character to its opcode, anything else is a comment and gets dropped
+OPCODES = {
+    "+": ADD,
+    "-": ADD,
+    ">": MOVE,
+    "<": MOVE,
+    "[": OPEN,
+    "]": CLOSE,
+    ".": OUTPUT,
+    ",": INPUT,
+    "{": FUNC,
+    "}": RET,
+    "(": CALL,
+    "|": ARGS,
+    ")": END_CALL,
+}
+
+# Commands only used by functions, a program without any of these is pure brainfuck
+FUNCTION_SYNTAX = "{}()|"
+
+# Breakpoints are only compiled in when debugging, otherwise # is a comment like any other character
+BREAKPOINT_OPCODES = dict(OPCODES, **{"#": TRAP})
+
+
+# Gives every bracket/brace op the index of its matching op, so it never has to be searched for at runtime
+def link_jumps(ops: List[int], args: List, positions: List[int]) -> None:
+    brace_stacks = {OPEN: deque(), FUNC: deque()}
+    for i, op in enumerate(ops):
+        if op == OPEN or op == FUNC:
+            brace_stacks[op].append(i)
+        elif op == CLOSE or op == RET:
+            stack = brace_stacks[OPEN if op == CLOSE else FUNC]
+            if not stack:
+                raise SyntaxError(f"Unmatched '{']' if op == CLOSE else '}'}' at position {positions[i]}")
+            open_brace = stack.pop()
+            args[open_brace] = i
+            args[i] = open_brace
+    for op, stack in brace_stacks.items():
+        if stack:
+            raise SyntaxError(f"Unmatched '{'[' if op == OPEN else '{'}' at position {positions[stack[-1]]}")
+
+
+# Compiles source into parallel lists of opcodes, arguments and source positions
+# Runs of +/- and >/< are folded into a single op with a net count and every bracket/brace is given its jump target
+def compile_bf(bf: str, optimize: bool = True, breakpoints: bool = False) -> Tuple[List[int], List, List[int]]:
+    opcodes = BREAKPOINT_OPCODES if breakpoints else OPCODES
+    ops = []
+    args = []
+    positions = []
+    for i, c in enumerate(bf):
+        op = opcodes.get(c)
+        if op is None:
+            continue
+
+        if op == ADD or op == MOVE:
+            # Folds the command into the previous op if it is part of the same run, dropping moves which cancel out
+            step = 1 if c in "+>" else -1
+            if ops and ops[-1] == op:
+                args[-1] += step
+                if op == MOVE and args[-1] == 0:
+                    ops.pop()
+                    args.pop()
+                    positions.pop()
+                continue
+            ops.append(op)
+            args.append(step)
+            positions.append(i)
+            continue
+
+        ops.append(op)
+        args.append(0)
+        positions.append(i)
+
+    # Normalises folded runs, a +/- run which cancels out is kept since it still deletes any function in the cell
+    for i, op in enumerate(ops):
+        if op == ADD:
+            args[i] %= 256
+        elif op == MOVE:
+            args[i] %= 30_000
+    link_jumps(ops, args, positions)
+
+    if optimize:
+        return optimize_loops(ops, args, positions)
+    return ops, args, positions
+
+
+# Replaces loops which only add and move with single ops, as these are where most programs spend nearly all their time
+# Pointer-neutral loops which step the current cell by an odd amount become CLEAR or MULTIPLY (add a multiple of the cell to each offset, then zero it)
+# Loops which only move become SCAN, a vectorised search for the next zero cell
+def optimize_loops(ops: List[int], args: List, positions: List[int]) -> Tuple[List[int], List, List[int]]:
+    new_ops = []
+    new_args = []
+    new_positions = []
+    i = 0
+    while i < len(ops):
+        if ops[i] == OPEN:
+            end = args[i]
+            body = range(i + 1, end)
+            if body and all(ops[j] == ADD or ops[j] == MOVE for j in body):
+
+                # Tracks the net change made to each offset from the cell the loop started on
+                offset = 0
+                deltas = {}
+                for j in body:
+                    if ops[j] == MOVE:
+                        offset += args[j] if args[j] < 15_000 else args[j] - 30_000
+                    else:
+                        deltas[offset] = (deltas.get(offset, 0) + args[j]) % 256
+
+                if len(body) == 1 and ops[i + 1] == MOVE:
+                    idiom = (SCAN, offset)
+                elif offset % 30_000 == 0 and deltas.get(0, 0) % 2 == 1:
+                    # The number of iterations is the cell multiplied by the inverse of its step, since an odd step always reaches 0
+                    inverse = pow(-deltas.pop(0), -1, 256)
+                    if deltas:
+                        idiom = (MULTIPLY, (inverse, tuple(deltas.items())))
+                    else:
+                        idiom = (CLEAR, inverse)
+                else:
+                    idiom = None
+
+                if idiom:
+                    new_ops.append(idiom[0])
+                    new_args.append(idiom[1])
+                    new_positions.append(positions[i])
+                    i = end + 1
+                    continue
+
+        new_ops.append(ops[i])
+        new_args.append(args[i])
+        new_positions.append(positions[i])
+        i += 1
+
+    link_jumps(new_ops, new_args, new_positions)
+    return new_ops, new_args, new_positions
+
+
+# Function values are the first and last ops of the function inside the engines, but the source positions of its braces outside of them
+# Maps the braces of every function in an op stream to its ops, for functions passed in as inputs
+def function_ops(ops: List[int], args: List, positions: List[int]) -> Dict[Tuple[int, int], Tuple[int, int]]:
+    return {(positions[i], positions[args[i]]): (i, args[i]) for i, op in enumerate(ops) if op == FUNC}
+
+
+# Keeps zeroed tapes for function scopes, so calls reuse the tapes of returned calls rather than allocating a new one each time
+class TapePool:
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self.free = []
+
+    # Hands out a zeroed tape, only allocating when none are free
+    def acquire(self) -> bytearray:
+        try:
+            return self.free.pop()
+        except IndexError:
+            return bytearray(30_000)
+
+    # Zeroes a tape which is no longer in use and keeps it for the next call
+    def release(self, mem: bytearray) -> None:
+        if len(self.free) < self.maxsize:
+            mem[:] = BLANK_TAPE
+            self.free.append(mem)
+
+
+# Zeroed tape copied over released tapes, which is quicker than zeroing them cell by cell
+BLANK_TAPE = bytes(30_000)
+
+# Shared pool of tapes for function scopes
+tape_pool = TapePool()
+
+
+# Remembers the return values of function calls, as functions can't touch the console so their returns only depend on their body and arguments
+# Entries are keyed by (body span, arguments) and evicted least recently used first once maxsize is reached
+class CallMemo:
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.program = None
+        self.hits = 0
+        self.misses = 0
+
+    # Body spans are only meaningful within one op stream, so entries are dropped whenever the memo is used with a new program or kind of stream
+    def bind(self, bf: str, kind: str = "ops") -> None:
+        if self.program != (kind, bf):
+            self.entries.clear()
+            self.program = (kind, bf)
+
+    # Returns the cached return values of a call, or None if it hasn't been seen
+    def get(self, key: Tuple) -> Tuple | None:
+        returns = self.entries.get(key)
+        if returns is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return returns
+
+    # Stores the return values of a call
+    def put(self, key: Tuple, returns: Tuple) -> None:
+        self.entries[key] = returns
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+# Finds the first zero cell from the pointer, stepping by the given amount and wrapping around the tape
+# Single steps search the tape in place, longer strides search a copy of every cell they land on
+def scan_zero(mem: bytearray, cell_ptr: int, step: int) -> int:
+    if step == 1:
+        hit = mem.find(0, cell_ptr)
+        if hit >= 0:
+            return hit
+    elif step == -1:
+        hit = mem.rfind(0, 0, cell_ptr + 1)
+        if hit >= 0:
+            return hit
+    while True:
+        window = mem[cell_ptr::step]
+        hit = window.find(0)
+        if hit >= 0:
+            return cell_ptr + hit * step
+        cell_ptr = (cell_ptr + len(window) * step) % 30_000
+
+
+# Hooks the interpreter calls into while a programme is being debugged, to be subclassed by whatever is driving it
+# step is called before every op while stepping is True, and interrupt is only checked on backwards jumps and calls, so full speed runs pay next to nothing
+class Debugger:
+    stepping = False
+    interrupt = False
+    positions = None
+
+    # Called as the programme starts with the source position of each op, so functions in func can be shown by the positions of their braces
+    def bind(self, positions: List[int]) -> None:
+        self.positions = positions
+
+    # Called when a breakpoint is reached
+    def trap(self, position: int, mem: bytearray, cell_ptr: int, func: Dict, depth: int) -> None:
+        pass
+
+    # Called before each op while stepping, or once an interrupt has been noticed
+    def step(self, position: int, mem: bytearray, cell_ptr: int, func: Dict, depth: int) -> None:
+        pass
+
+
+# Raised by a debugger to stop the programme
+class Halt(Exception):
+    pass
+
+
+# Raised when a programme run by execute_async goes over its budget of ops
+class BudgetExceeded(Halt):
+    pass
+
+
+# Yielded by execute_stream in place of an output when it runs in slices, before the op which ends each slice and whenever it needs a top level input
+# The input is then sent back into the generator, as can the number of ops in the next slice, with anything else being thrown into it
+SLICE_END = object()
+NEED_INPUT = object()
+
+
+# Pulls inputs from an iterator only when the programme asks for one, standing in for the deque of top level inputs
+class InputStream:
+
+    def __init__(self, inputs: Iterable) -> None:
+        self.inputs = iter(inputs)
+        self.consumed = 0
+
+    def popleft(self) -> int | Tuple[int, int]:
+        try:
+            value = next(self.inputs)
+        except StopIteration:
+            raise IndexError("ran out of inputs") from None
+        self.consumed += 1
+        return value
+
+    # Drops the inputs a resumed programme had already taken before it was checkpointed
+    def skip(self, n: int) -> None:
+        for _ in range(n):
+            self.popleft()
+
+
+# Views inputs given as bytes, a bytearray, a memoryview or an mmap'd file as a flat buffer of bytes, or returns None for any other iterable
+def byte_view(inputs: Iterable) -> memoryview | None:
+    if isinstance(inputs, (bytes, bytearray, memoryview, mmap)):
+        return memoryview(inputs).cast("B")
+    return None
+
+
+# Reads top level inputs straight out of a buffer of bytes by index, so large inputs are never copied or boxed up front
+class ByteInputs:
+
+    def __init__(self, data: memoryview) -> None:
+        self.data = data
+        self.consumed = 0
+
+    def popleft(self) -> int:
+        if self.consumed == len(self.data):
+            raise IndexError("ran out of inputs")
+        value = self.data[self.consumed]
+        self.consumed += 1
+        return value
+
+    # Drops the inputs a resumed programme had already taken before it was checkpointed
+    def skip(self, n: int) -> None:
+        if self.consumed + n > len(self.data):
+            raise IndexError("ran out of inputs")
+        self.consumed += n
+
+
+# Wraps top level inputs in whatever reads them quickest, indexing into buffers of bytes and pulling from any other iterable
+def input_stream(inputs: Iterable) -> ByteInputs | InputStream:
+    data = byte_view(inputs)
+    return InputStream(inputs) if data is None else ByteInputs(data)
+
+
+# Collects top level outputs into a preallocated bytearray, which doubles whenever it fills up, rather than boxing each one into a deque
+# Functions can't be written as a byte, so they go into a side channel of (offset, function) pairs, where offset is how many bytes came before them
+class ByteOutputs:
+
+    def __init__(self, capacity: int = 65536) -> None:
+        self.buffer = bytearray(max(capacity, 1))
+        self.length = 0
+        self.functions = []
+
+    def append(self, value: int | Tuple[int, int]) -> None:
+        if isinstance(value, int):
+            if self.length == len(self.buffer):
+                self.buffer.extend(bytes(len(self.buffer)))
+            self.buffer[self.length] = value
+            self.length += 1
+        else:
+            self.functions.append((self.length, value))
+
+    # Copies a whole buffer of byte outputs in at once
+    def extend(self, data) -> None:
+        data = memoryview(data).cast("B")
+        end = self.length + len(data)
+        if end > len(self.buffer):
+            self.buffer.extend(bytes(max(end, len(self.buffer) * 2) - len(self.buffer)))
+        self.buffer[self.length:end] = data
+        self.length = end
+
+    # Returns the bytes written so far as a view onto the buffer, which must be released before any more are written
+    def view(self) -> memoryview:
+        return memoryview(self.buffer)[:self.length]
+
+    def __len__(self) -> int:
+        return self.length + len(self.functions)
+
+    # Yields every output in the order it was produced, with the functions merged back in between the bytes
+    def __iter__(self) -> Iterator[int | Tuple[int, int]]:
+        start = 0
+        for offset, value in self.functions:
+            yield from self.buffer[start:offset]
+            yield value
+            start = offset
+        yield from self.buffer[start:self.length]
+
+
+# Deepest function calls can nest by default, and as each call holds a 30KB tape this caps them at about 120MB
+MAX_DEPTH = 4096
+
+
+# State of one scope of a running programme, the top level or a function call
+# The running frame's pointer, inputs and outputs live in locals of the interpreter, and are only written back when it calls a function or is checkpointed
+# return_ptr is the op the call was made from, and memo_key is what the call's returns are memoised under if a CallMemo is in use
+class Frame:
+    __slots__ = ("mem", "cell_ptr", "func", "inputs", "outputs", "return_ptr", "memo_key")
+
+    def __init__(self, mem: bytearray, cell_ptr: int, func: Dict, inputs: deque | None, outputs: deque | None, return_ptr: int, memo_key: Tuple | None) -> None:
+        self.mem = mem
+        self.cell_ptr = cell_ptr
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.return_ptr = return_ptr
+        self.memo_key = memo_key
+
+
 # Executes brainfuck, with default arguments being used to handle recursion
-def execute(bf: str, inputs: List[int] | Tuple[int] = tuple()) -> deque:
+# Passing a CallMemo skips executing any function call which has already been made with the same arguments, and passing a Profile counts what ran
+# Passing a Checkpointer saves the state as it runs, and passing a checkpoint as resume carries on from it
+# Otherwise pure brainfuck is handed to the numba engine when numba is installed
+# Passing a ByteOutputs collects the outputs into it and returns it, instead of returning them as a deque
+# Function calls can nest up to max_depth deep, and a limit other than the default always runs on the interpreter
+def execute(bf: str, inputs: List[int] | Tuple[int] | bytes = tuple(), memo: CallMemo | None = None, profile: Profile | None = None, checkpointer: Checkpointer | None = None, resume: bytes | None = None, outputs: ByteOutputs | None = None, max_depth: int = MAX_DEPTH) -> deque | ByteOutputs:
+    if memo is None and profile is None and checkpointer is None and resume is None and max_depth == MAX_DEPTH:
+        return execute_numba(bf, inputs, outputs)
+    run = execute_stream(bf, inputs, memo, profile, checkpointer=checkpointer, resume=resume, outputs=outputs, max_depth=max_depth)
+    if outputs is None:
+        return deque(run)
+    for _ in run:
+        pass
+    return outputs
+
+
+# Executes brainfuck as a generator, pulling inputs lazily from any iterable and yielding each top level output as soon as it is produced
+# Top level outputs are never stored, so memory stays flat however long the programme runs
+# Passing a Debugger compiles in breakpoints, and any exception raised while running is given the source position it was raised at
+# Passing a Trace records every op which runs while the debugger is stepping, so it can step back through them, starting afresh each time stepping starts again
+# Passing a Checkpointer lets the state be saved as it runs, and passing a checkpoint as resume carries on from where it was taken
+# Passing slice_ops runs the programme cooperatively, yielding SLICE_END every slice_ops ops (or as many as are sent back for the next slice) and NEED_INPUT for each top level input rather than reading inputs
+# Passing outputs (a ByteOutputs or anything else with append) collects top level outputs into it rather than yielding them
+# Passing max_depth limits how deeply function calls can nest, so runaway recursion raises a RecursionError rather than using up memory
+def execute_stream(bf: str, inputs: Iterable = tuple(), memo: CallMemo | None = None, profile: Profile | None = None, debugger: Debugger | None = None, trace: Trace | None = None, checkpointer: Checkpointer | None = None, resume: bytes | None = None, slice_ops: int | None = None, outputs: ByteOutputs | None = None, max_depth: int = MAX_DEPTH) -> Iterator[int | Tuple[int, int]]:
 
     # Declares key variables
-    loops = build_brace_map(bf, ("[", "]"))
-    funcs = build_brace_map(bf, ("{", "}"))
-    mem_scopes = deque()
-    cell_ptr_scopes = deque()
-    func_scopes = deque()
-    inputs_scopes = deque()
-    outputs_scopes = deque()
-    mem_scopes.append(np.zeros(30_000, dtype=np.uint8))
-    cell_ptr_scopes.append(0)
-    func_scopes.append({})
-    inputs_scopes.append(deque(inputs))
-    outputs_scopes.append(deque())
-    bf_ptr = 0
-
-    # Executes all commands
-    while bf_ptr < len(bf):
-
-        # Creates references to the current local scope
-        mem = mem_scopes[-1]
-        cell_ptr = cell_ptr_scopes[-1]
-        func = func_scopes[-1]
-        inputs = inputs_scopes[-1]
-        outputs = outputs_scopes[-1]
-
-        # Executes current command
-        match bf[bf_ptr]:
-
-            case ">":
-                # Increments cell pointer, handles wrapping, and updates stack (because integers for the pointer are immutable)
-                cell_ptr += 1
-                if cell_ptr == 30_000:
-                    cell_ptr = 0
-                cell_ptr_scopes.pop()
-                cell_ptr_scopes.append(cell_ptr)
-
-            case "<":
-                # Decrements cell pointer, handles wrapping, and updates stack (because integers for the pointer are immutable)
-                cell_ptr -= 1
-                if cell_ptr == -1:
-                    cell_ptr = 29_999
-                cell_ptr_scopes.pop()
-                cell_ptr_scopes.append(cell_ptr)
-
-            case "+":
-                # Increments value at cell and deletes any functions present in cell
-                mem[cell_ptr] += 1
+    debugging = debugger is not None
+    kind = "debug" if debugging else "ops"
+    ops, args, positions = cache.ops(bf, debugging)
+    if memo is not None:
+        memo.bind(bf, kind)
+    if debugging:
+        debugger.bind(positions)
+    profiling = profile is not None
+    if profiling:
+        profile.bind(bf, positions)
+        op_counts = profile.ops
+        loop_counts = profile.loops
+        call_counts = profile.calls
+    traced = trace is not None
+    checkpointing = checkpointer is not None
+    periodic = checkpointing and bool(checkpointer.every)
+    if periodic:
+        countdown = checkpointer.every
+    slicing = slice_ops is not None
+    if slicing:
+        slice_left = slice_ops
+    recording = profiling or periodic or slicing
+    stepping = debugging and debugger.stepping
+    instrumented = recording or stepping
+    tracing = False
+    sink = outputs
+    top_inputs = input_stream(inputs)
+    top_functions = None
+
+    # The top level frame, where None stands for the top level inputs and outputs
+    # Calls in progress are kept as (cell pointer of the function, outputs to go back to) and the inputs to go back to at the end of each call
+    frames = deque()
+    frames.append(Frame(bytearray(30_000), 0, {}, None, None, -1, None))
+    call_stack = deque()
+    inputs_stack = deque()
+    op_ptr = 0
+    scopes = (frames, call_stack, inputs_stack, top_inputs)
+    digest = program_digest(kind, bf) if checkpointing or resume is not None else None
+    if resume is not None:
+        from instruments import restore_checkpoint
+        op_ptr, consumed = restore_checkpoint(resume, digest, scopes)
+        if memo is not None and any(frame.memo_key is None for frame in list(frames)[1:]):
+            raise ValueError("checkpoint was taken without a CallMemo")
+        top_inputs.skip(consumed)
+    if checkpointing:
+        checkpointer.bind(digest, scopes)
+
+    # Loads the frame being executed into locals, which are only written back to it when a call is made or the state is checkpointed
+    frame = frames[-1]
+    mem = frame.mem
+    cell_ptr = frame.cell_ptr
+    func = frame.func
+    inputs = frame.inputs
+    outputs = frame.outputs
+    depth = len(frames) - 1
+    n_ops = len(ops)
+
+    # Executes all ops, tagging any error with the source position of the op which raised it
+    try:
+        while op_ptr < n_ops:
+            op = ops[op_ptr]
+            if instrumented:
+                if checkpointing:
+                    checkpointer.op_ptr = op_ptr
+                    frame.cell_ptr = cell_ptr
+                    frame.inputs = inputs
+                    frame.outputs = outputs
+                    if periodic:
+                        countdown -= 1
+                        if countdown == 0:
+                            checkpointer.save()
+                            countdown = checkpointer.every
+                if slicing:
+                    slice_left -= 1
+                    if slice_left == 0:
+                        slice_left = (yield SLICE_END) or slice_ops
+                if profiling:
+                    op_counts[op_ptr] += 1
+                if stepping:
+                    if traced:
+                        if not tracing:
+                            frame.cell_ptr = cell_ptr
+                            trace.start(frames, positions[op_ptr])
+                            tracing = True
+                        trace.step(positions[op_ptr], mem, cell_ptr, depth)
+                    debugger.step(positions[op_ptr], mem, cell_ptr, func, depth)
+                    stepping = debugger.stepping
+                    tracing = tracing and stepping
+                    instrumented = recording or stepping
+
+            # Executes current op
+            if op == ADD:
+                # Adds the folded count to the cell (wrapping) and deletes any functions present in cell
+                mem[cell_ptr] = (mem[cell_ptr] + args[op_ptr]) & 255
                 if cell_ptr in func:
                     func.pop(cell_ptr)
 
-            case "-":
-                # Decrements value at cell and deletes any functions present in cell
-                mem[cell_ptr] -= 1
+            elif op == MOVE:
+                # Moves the cell pointer by the folded count and handles wrapping
+                cell_ptr += args[op_ptr]
+                if cell_ptr >= 30_000:
+                    cell_ptr -= 30_000
+
+            elif op == OPEN:
+                # Moves to end of loop if cell is 0
+                if mem[cell_ptr] == 0:
+                    op_ptr = args[op_ptr]
+                elif profiling:
+                    loop_counts[op_ptr] += 1
+
+            elif op == CLOSE:
+                # Moves to the beginning of loop if cell is not 0
+                if mem[cell_ptr] != 0:
+                    op_ptr = args[op_ptr]
+                    if profiling:
+                        loop_counts[op_ptr] += 1
+                    if debugging and debugger.interrupt:
+                        stepping = instrumented = True
+
+            elif op == CLEAR:
+                # Zeroes the cell in one step rather than looping down to 0
+                if mem[cell_ptr] != 0:
+                    if profiling:
+                        loop_counts[op_ptr] += mem[cell_ptr] * args[op_ptr] & 255
+                    mem[cell_ptr] = 0
+                    if cell_ptr in func:
+                        func.pop(cell_ptr)
+
+            elif op == MULTIPLY:
+                # Adds a multiple of the cell to each offset it would have been moved to by the loop, then zeroes it
+                value = mem[cell_ptr]
+                if value != 0:
+                    inverse, targets = args[op_ptr]
+                    count = value * inverse
+                    if profiling:
+                        loop_counts[op_ptr] += count & 255
+                    for offset, factor in targets:
+                        target = (cell_ptr + offset) % 30_000
+                        if tracing:
+                            trace.write(target, mem[target], (mem[target] + count * factor) & 255)
+                        mem[target] = (mem[target] + count * factor) & 255
+                        if target in func:
+                            func.pop(target)
+                    mem[cell_ptr] = 0
+                    if cell_ptr in func:
+                        func.pop(cell_ptr)
+
+            elif op == SCAN:
+                # Moves the pointer straight to the next zero cell
+                if mem[cell_ptr] != 0:
+                    step = args[op_ptr]
+                    start = cell_ptr
+                    cell_ptr = scan_zero(mem, cell_ptr, step)
+                    if profiling:
+                        loop_counts[op_ptr] += (cell_ptr - start) * (1 if step > 0 else -1) % 30_000 // abs(step)
+
+            elif op == OUTPUT:
+                # Outputs value or function at cell, yielding it straight away (or writing it to the sink) if it is a top level output
+                # Functions leaving the programme are given by the source positions of their braces
                 if cell_ptr in func:
-                    func.pop(cell_ptr)
+                    value = func[cell_ptr]
+                    if outputs is None:
+                        value = (positions[value[0]], positions[value[1]])
+                else:
+                    value = mem[cell_ptr]
+                if outputs is not None:
+                    outputs.append(value)
+                elif sink is None:
+                    yield value
+                else:
+                    sink.append(value)
 
-            case ",":
+            elif op == INPUT:
                 # Passes input to memory or function memory
-                inp = inputs.popleft()
+                if inputs is not None:
+                    inp = inputs.popleft()
+                elif slicing:
+                    inp = yield NEED_INPUT
+                else:
+                    inp = top_inputs.popleft()
                 if isinstance(inp, int):
                     mem[cell_ptr] = inp
                 else:
+                    if inputs is None:
+                        if top_functions is None:
+                            top_functions = function_ops(ops, args, positions)
+                        inp = top_functions[inp]
                     mem[cell_ptr] = 0
                     func[cell_ptr] = inp
 
-            case ".":
-                # Outputs value or function at cell
-                if cell_ptr in func:
-                    outputs.append(func[cell_ptr])
+            elif op == FUNC:
+                # Stores the first and last ops of the function for when the function at this pointer is called
+                mem[cell_ptr] = 0
+                func[cell_ptr] = (op_ptr, args[op_ptr])
+                op_ptr = args[op_ptr]
+
+            elif op == RET:
+                # Drops the function's frame, returning its tape to the pool, and moves back to the function call with its outputs as the call's inputs
+                if tracing:
+                    trace.pop()
+                tape_pool.release(mem)
+                returns = outputs
+                callee = frames.pop()
+                op_ptr = callee.return_ptr
+                if memo is not None:
+                    memo.put(callee.memo_key, tuple(returns))
+                frame = frames[-1]
+                depth -= 1
+                mem = frame.mem
+                cell_ptr = frame.cell_ptr
+                func = frame.func
+                inputs_stack.append(frame.inputs)
+                inputs = returns
+                outputs = frame.outputs
+
+            elif op == CALL:
+                # Collects the first half of the function call's outputs as its arguments, remembering the cell pointer of the function being called
+                call_stack.append((cell_ptr, outputs))
+                outputs = deque()
+
+            elif op == ARGS:
+                call_ptr, caller_outputs = call_stack.pop()
+                if debugging and debugger.interrupt:
+                    stepping = instrumented = True
+                body = func[call_ptr]
+                if profiling:
+                    call_counts[body[0]] += 1
+
+                # Skips the function entirely if it has already returned for these arguments, passing its cached returns to the rest of the call
+                key = None
+                if memo is not None:
+                    key = (body, tuple(outputs))
+                    returns = memo.get(key)
+                    if returns is not None:
+                        inputs_stack.append(inputs)
+                        inputs = deque(returns)
+                        outputs = caller_outputs
+                        op_ptr += 1
+                        continue
+                if depth == max_depth:
+                    raise RecursionError(f"function calls nested deeper than the maximum depth of {max_depth}")
+
+                # Saves the caller's state into its frame, then moves to the beginning of the function in a new frame with the call's outputs as its arguments
+                frame.cell_ptr = cell_ptr
+                frame.inputs = inputs
+                frame.outputs = caller_outputs
+                frame = Frame(tape_pool.acquire(), 0, {}, outputs, deque(), op_ptr, key)
+                frames.append(frame)
+                depth += 1
+                mem = frame.mem
+                cell_ptr = 0
+                func = frame.func
+                inputs = frame.inputs
+                outputs = frame.outputs
+                if tracing:
+                    trace.push(depth)
+                op_ptr = body[0]
+
+            elif op == END_CALL:
+                inputs = inputs_stack.pop()
+
+            elif debugging:
+                # Hands control to the debugger at a breakpoint, which decides whether to carry on stepping
+                if checkpointing:
+                    checkpointer.op_ptr = op_ptr
+                    frame.cell_ptr = cell_ptr
+                    frame.inputs = inputs
+                    frame.outputs = outputs
+                debugger.trap(positions[op_ptr], mem, cell_ptr, func, depth)
+                stepping = debugger.stepping
+                tracing = tracing and stepping
+                instrumented = recording or stepping
+
+            # Increments op pointer to execute next op
+            op_ptr += 1
+        if tracing:
+            trace.settle()
+    except Exception as e:
+        e.position = positions[op_ptr] if op_ptr < n_ops else len(bf)
+        raise
+
+
+# Executes brainfunc as a coroutine, running slice_ops ops at a time and handing control back to the event loop between slices, so many programmes can share one loop fairly
+# Top level inputs are only awaited from inputs (an async or plain iterable) when the programme asks for one
+# Outputs are put on the given queue as soon as they are produced, otherwise they are returned as a deque once the programme ends
+# Raises BudgetExceeded rather than running more than budget ops, by cutting the last slice short, and cancelling the task stops the programme at the end of its current slice
+async def execute_async(bf: str, inputs: AsyncIterable | Iterable = tuple(), outputs: asyncio.Queue | None = None, slice_ops: int = 10_000, budget: int | None = None, memo: CallMemo | None = None) -> deque | None:
+    import asyncio
+    if hasattr(inputs, "__aiter__"):
+        inputs = inputs.__aiter__()
+        next_input = inputs.__anext__
+    else:
+        inputs = iter(inputs)
+        next_input = None
+    collected = deque() if outputs is None else None
+    # Each SLICE_END comes just before the op which ends the slice runs, so reached counts that op as well as every op before it
+    size = slice_ops if budget is None else min(slice_ops, budget + 1)
+    run = execute_stream(bf, memo=memo, slice_ops=size)
+    reached = size
+    sent = None
+    error = None
+    try:
+        while True:
+            # Sends the programme the input it asked for, or throws an error into it so it is given the position it happened at
+            try:
+                value = run.send(sent) if error is None else run.throw(error)
+            except StopIteration:
+                return collected
+            sent = error = None
+
+            if value is SLICE_END:
+                if budget is not None and reached > budget:
+                    error = BudgetExceeded(f"ran over its budget of {budget} ops")
                 else:
-                    outputs.append(int(mem[cell_ptr]))
+                    sent = slice_ops if budget is None else min(slice_ops, budget + 1 - reached)
+                    reached += sent
+                    await asyncio.sleep(0)
+            elif value is NEED_INPUT:
+                try:
+                    sent = await next_input() if next_input else next(inputs)
+                except (StopAsyncIteration, StopIteration):
+                    error = IndexError("ran out of inputs")
+            elif collected is None:
+                await outputs.put(value)
+            else:
+                collected.append(value)
+    finally:
+        run.close()
 
-            case "[" if mem[cell_ptr] == 0:
-                # Moves to end of loop if cell is 0
-                bf_ptr = loops[bf_ptr]
 
-            case "]" if mem[cell_ptr] != 0:
-                # Moves to the beginning of loop if cell is not 0
-                bf_ptr = loops[bf_ptr]
+# Emits python source for the ops between start and stop, with loops becoming while blocks
+# The bodies of any functions defined in this range are collected so they can be emitted as their own python functions
+# Top level outputs and inputs give functions as the source positions of their braces, through the SOURCES and FUNCTIONS tables
+# Calls made at the top level still pass functions to each other as ops, so top only emits the check for which is in use
+def emit_block(ops: List[int], args: List, start: int, stop: int, indent: int, lines: List[str], bodies: List[Tuple[int, int]], top: bool = False) -> None:
+    pad = "    " * indent
+    first = len(lines)
+    i = start
+    while i < stop:
+        op = ops[i]
+        arg = args[i]
 
-            case "{":
-                # Finds start and end characters of the function and stores these for when the function at this pointer is called
-                mem[cell_ptr] = 0
-                func[cell_ptr] = (bf_ptr, funcs[bf_ptr])
-                bf_ptr = funcs[bf_ptr]
-
-            case "}":
-                # Deletes the current function's local scopes and moves back to the function call
-                mem_scopes.pop()
-                cell_ptr_scopes.pop()
-                func_scopes.pop()
-                inputs_scopes.pop()
-                outputs_scopes.pop()
-                inputs_scopes.append(outputs)
-                bf_ptr = call_ptr
-
-            case "(":
-                # Creates a new local scope for the first half of the function call's outputs and stores the cell pointer of the function being called
-                outputs_scopes.append(deque())
-                call_ptr = cell_ptr
-
-            case "|":
-                # Moves to the beginning of the function which has been called and passes the outputs from the call as arguments to the function
-                mem_scopes.append(np.zeros(30_000, dtype=np.uint8))
-                cell_ptr_scopes.append(0)
-                func_scopes.append({})
-                inputs_scopes.append(outputs)
-                outputs_scopes.pop()
-                outputs_scopes.append(deque())
-                bf_ptr, call_ptr = func[call_ptr][0], bf_ptr
-
-            case ")":
-                inputs_scopes.pop()
-
-        # Increments code pointer to execute next command
-        bf_ptr += 1
-
-    return outputs_scopes[0]
+        if op == ADD:
+            lines.append(f"{pad}mem[ptr] = (mem[ptr] + {arg}) & 255")
+            lines.append(f"{pad}func.pop(ptr, None)")
+
+        elif op == MOVE:
+            lines.append(f"{pad}ptr = (ptr + {arg}) % 30_000")
+
+        elif op == OPEN:
+            if arg >= stop:
+                raise SyntaxError(f"Loop starting at op {i} crosses the end of a function")
+            lines.append(f"{pad}while mem[ptr] != 0:")
+            emit_block(ops, args, i + 1, arg, indent + 1, lines, bodies, top)
+            i = arg
+
+        elif op == CLOSE or op == RET:
+            raise SyntaxError(f"Loop ending at op {i} crosses the start of a function")
+
+        elif op == CLEAR:
+            lines.append(f"{pad}if mem[ptr] != 0:")
+            lines.append(f"{pad}    mem[ptr] = 0")
+            lines.append(f"{pad}    func.pop(ptr, None)")
+
+        elif op == MULTIPLY:
+            inverse, targets = arg
+            lines.append(f"{pad}if mem[ptr] != 0:")
+            lines.append(f"{pad}    count = mem[ptr] * {inverse}")
+            for offset, factor in targets:
+                lines.append(f"{pad}    target = (ptr + {offset}) % 30_000")
+                lines.append(f"{pad}    mem[target] = (mem[target] + count * {factor}) & 255")
+                lines.append(f"{pad}    func.pop(target, None)")
+            lines.append(f"{pad}    mem[ptr] = 0")
+            lines.append(f"{pad}    func.pop(ptr, None)")
+
+        elif op == SCAN:
+            lines.append(f"{pad}if mem[ptr] != 0:")
+            lines.append(f"{pad}    ptr = scan_zero(mem, ptr, {arg})")
+
+        elif op == OUTPUT:
+            if top:
+                lines.append(f"{pad}outputs.append((SOURCES[func[ptr]] if outputs is top_outputs else func[ptr]) if ptr in func else mem[ptr])")
+            else:
+                lines.append(f"{pad}outputs.append(func[ptr] if ptr in func else mem[ptr])")
+
+        elif op == INPUT:
+            lines.append(f"{pad}inp = inputs.popleft()")
+            lines.append(f"{pad}if isinstance(inp, int):")
+            lines.append(f"{pad}    mem[ptr] = inp")
+            lines.append(f"{pad}else:")
+            lines.append(f"{pad}    mem[ptr] = 0")
+            lines.append(f"{pad}    func[ptr] = FUNCTIONS[inp] if inputs is top_inputs else inp" if top else f"{pad}    func[ptr] = inp")
+
+        elif op == FUNC:
+            if arg >= stop:
+                raise SyntaxError(f"Function starting at op {i} crosses the end of a loop")
+            lines.append(f"{pad}mem[ptr] = 0")
+            lines.append(f"{pad}func[ptr] = ({i}, {arg})")
+            bodies.append((i, arg))
+            i = arg
+
+        elif op == CALL:
+            # The call's arguments are collected in a fresh outputs deque, while the caller's outputs are kept for the returns
+            lines.append(f"{pad}call_stack.append((ptr, outputs))")
+            lines.append(f"{pad}outputs = deque()")
+
+        elif op == ARGS:
+            # Runs the called function and reads its return values as inputs till the end of the call
+            lines.append(f"{pad}call_ptr, caller_outputs = call_stack.pop()")
+            lines.append(f"{pad}inputs_stack.append(inputs)")
+            lines.append(f"{pad}inputs = BODIES[func[call_ptr]](outputs)")
+            lines.append(f"{pad}outputs = caller_outputs")
+
+        else:
+            lines.append(f"{pad}inputs = inputs_stack.pop()")
+
+        i += 1
+
+    if len(lines) == first:
+        lines.append(f"{pad}pass")
+
+
+# Translates the program into python source, with the main programme as run() and each function body as its own python function
+def generate_python(bf: str) -> str:
+    ops, args, positions = compile_bf(bf)
+    lines = []
+    bodies = []
+    scope = [
+        "    ptr = 0",
+        "    func = {}",
+        "    call_stack = []",
+        "    inputs_stack = []",
+    ]
+
+    # Top level outputs go into the given sink if there is one
+    lines.append("def run(inputs, outputs=None):")
+    lines.append("    mem = bytearray(30_000)")
+    lines.extend(scope)
+    lines.append("    inputs = input_stream(inputs)")
+    lines.append("    if outputs is None:")
+    lines.append("        outputs = deque()")
+    lines.append("    top_inputs = inputs")
+    lines.append("    top_outputs = outputs")
+    emit_block(ops, args, 0, len(ops), 1, lines, bodies, top=True)
+    lines.append("    return outputs")
+
+    # Bodies can define further functions, so this keeps going till every nested body has been emitted
+    for start, end in bodies:
+        lines.append("")
+        lines.append(f"def func_{start}(inputs):")
+        lines.append("    mem = tape_pool.acquire()")
+        lines.extend(scope)
+        lines.append("    outputs = deque()")
+        emit_block(ops, args, start + 1, end, 1, lines, bodies)
+        lines.append("    tape_pool.release(mem)")
+        lines.append("    return outputs")
+
+    lines.append("")
+    lines.append(f"BODIES = {{{', '.join(f'({start}, {end}): func_{start}' for start, end in bodies)}}}")
+    lines.append(f"FUNCTIONS = {function_ops(ops, args, positions)!r}")
+    lines.append("SOURCES = {ops: braces for braces, ops in FUNCTIONS.items()}")
+    return "\n".join(lines) + "\n"
+
+
+# Names of the files the cache stores programs in, and of the temporary files they are written through
+# Nothing else in the cache directory is ever counted, evicted or cleared, as it may be shared with other data
+CACHE_FILE = re.compile(r"[0-9a-f]{64}\.(ops|debug|python|native)")
+CACHE_TEMP = re.compile(r"[0-9a-f]{64}\.(ops|debug|python|native)\.\w+\.tmp")
+
+# Temporary files older than this many seconds were left by a writer which died, and are removed by the next write
+STALE_TEMP = 600
+
+
+# Caches compiled programs, keyed by a hash of the source and the engine version, so warm runs skip parsing and optimisation
+# Recently used programs are kept in memory, and if a directory is given, op streams and code objects are also marshalled to disk
+class CompileCache:
+
+    def __init__(self, maxsize: int = 128, path: str | None = None, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.maxsize = maxsize
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+
+    # Returns the compiled op stream for a program
+    def ops(self, bf: str, breakpoints: bool = False) -> Tuple[List[int], List, List[int]]:
+        return self.lookup("debug" if breakpoints else "ops", bf, lambda: compile_bf(bf, breakpoints=breakpoints), lambda stream: stream)
+
+    # Returns the callable generated by the python engine for a program
+    def python(self, bf: str) -> Callable[[Iterable], deque]:
+        return self.lookup("python", bf, lambda: compile(generate_python(bf), "<brainfunc>", "exec"), load_python)
+
+    # Returns the arrays the numba engine runs for a pure brainfuck program
+    def native(self, bf: str) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+        from native import encode_native, load_native
+        return self.lookup("native", bf, lambda: encode_native(bf), load_native)
+
+    # Finds a program in memory then on disk, only compiling it if both miss
+    def lookup(self, kind: str, bf: str, build: Callable, load: Callable):
+        key = (kind, bf)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+
+        compiled = self.read(kind, bf)
+        if compiled is None:
+            compiled = build()
+            self.write(kind, bf, compiled)
+        value = load(compiled)
+
+        self.memory[key] = value
+        if len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+        return value
+
+    # Names the file a program is stored in on disk
+    def file(self, kind: str, bf: str) -> str:
+        return os.path.join(self.path, f"{program_digest(kind, bf)}.{kind}")
+
+    # Loads a compiled program from disk, treating unreadable files as a miss
+    # Another process can evict the file at any point, which just makes it a miss too
+    def read(self, kind: str, bf: str):
+        if not self.path:
+            return None
+        file = self.file(kind, bf)
+        try:
+            with open(file, "rb") as f:
+                compiled = marshal.load(f)
+            os.utime(file)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return compiled
+
+    # Stores a compiled program on disk, then evicts the least recently used files till the cache fits in max_bytes
+    # Each write goes through its own temporary file so processes sharing the directory never see half written programs
+    # Failing to store or evict anything is ignored, as the program has already been compiled and is only missed next time
+    def write(self, kind: str, bf: str, compiled) -> None:
+        if not self.path:
+            return
+        import tempfile
+        file = self.file(kind, bf)
+        try:
+            fd, temp = tempfile.mkstemp(prefix=f"{os.path.basename(file)}.", suffix=".tmp", dir=self.path)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump(compiled, f)
+            os.replace(temp, file)
+        except (OSError, ValueError):
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            return
+
+        # Files removed by another process while scanning are skipped, as they no longer take up any space
+        entries = []
+        now = time()
+        for entry in self.entries():
+            try:
+                stat = entry.stat()
+                if CACHE_FILE.fullmatch(entry.name):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                elif now - stat.st_mtime > STALE_TEMP:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path != file:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+    # Lists the programs and temporary files the cache has stored on disk, leaving out anything else in its directory
+    def entries(self) -> List[os.DirEntry]:
+        try:
+            scan = list(os.scandir(self.path))
+        except OSError:
+            return []
+        return [entry for entry in scan if (CACHE_FILE.fullmatch(entry.name) or CACHE_TEMP.fullmatch(entry.name)) and entry.is_file(follow_symlinks=False)]
+
+    # Empties the cache in memory and on disk, where a write in progress in another process just fails to store its program
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.path:
+            for entry in self.entries():
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+# Runs the code object generated for a program, returning its run() callable
+def load_python(code) -> Callable[[Iterable], deque]:
+    namespace = {"deque": deque, "input_stream": input_stream, "scan_zero": scan_zero, "tape_pool": tape_pool}
+    exec(code, namespace)
+    return namespace["run"]
+
+
+# Shared cache used by the engines, which also stores programs on disk if BRAINFUNC_CACHE is set to a directory
+cache = CompileCache(path=os.environ.get("BRAINFUNC_CACHE"))
+
+
+# Compiles the generated python for a program once, returning a callable which takes inputs (and optionally a sink for the outputs) and returns the outputs
+def compile_python(bf: str) -> Callable[[Iterable], deque]:
+    return cache.python(bf)
+
+
+# Executes brainfunc through the generated python engine, a drop in replacement for execute
+def execute_python(bf: str, inputs: Iterable = tuple(), outputs: ByteOutputs | None = None) -> deque | ByteOutputs:
+    return compile_python(bf)(inputs, outputs)
+
+
+# Executes brainfuck on the numba engine when it is installed and the program is pure brainfuck taking bytes, otherwise on the interpreter
+# Outputs and errors match the interpreter, including the position an error was raised at and the outputs collected in a given ByteOutputs before it
+# Buffers of bytes are handed to the numba engine without being copied
+def execute_numba(bf: str, inputs: List[int] | Tuple[int] | bytes = tuple(), outputs: ByteOutputs | None = None) -> deque | ByteOutputs:
+    data = byte_view(inputs)
+    if (
+        not numba_installed or
+        any(c in bf for c in FUNCTION_SYNTAX) or
+        data is None and not isinstance(inputs, (tuple, list)) or
+        data is None and not all(isinstance(i, int) and 0 <= i < 256 for i in inputs)
+    ):
+        return execute_interpreter(bf, inputs, outputs)
+
+    import numpy as np
+    from native import run_native
+    if run_native is None:
+        return execute_interpreter(bf, inputs, outputs)
+    code, targets, positions = cache.native(bf)
+    tape_inputs = np.array(inputs, dtype=np.uint8) if data is None else np.frombuffer(data, dtype=np.uint8)
+    written, n_outputs, op_ptr = run_native(code, targets, tape_inputs)
+    if outputs is not None:
+        outputs.extend(written[:n_outputs])
+    if op_ptr < len(positions):
+        e = IndexError("ran out of inputs")
+        e.position = positions[op_ptr]
+        raise e
+    if outputs is None:
+        return deque(written[:n_outputs].tolist())
+    return outputs
+
+
+# Executes brainfunc on the interpreter alone, so it can be compared with the other engines even for pure brainfuck
+def execute_interpreter(bf: str, inputs: Iterable = tuple(), outputs: ByteOutputs | None = None) -> deque | ByteOutputs:
+    if outputs is None:
+        return deque(execute_stream(bf, inputs))
+    for _ in execute_stream(bf, inputs, outputs=outputs):
+        pass
+    return outputs
+
+
+# Engines which can be swapped for one another, all taking a program and its inputs and returning the outputs deque, or filling in a ByteOutputs if given one
+ENGINES = {
+    "interpreter": execute_interpreter,
+    "python": execute_python,
+    "numba": execute_numba,
+}
+
+
+# Program and engine shared by every job in a worker process, set once when the worker starts
+worker_program = None
+worker_engine = None
+
+
+# Stores the program and engine in a worker process, so they aren't sent with each job
+def init_worker(bf: str | None, engine: Callable) -> None:
+    global worker_program, worker_engine
+    worker_program = bf
+    worker_engine = engine
+
+
+# Runs a single job in a worker process, returning the exception rather than raising it so one failure doesn't abort the batch
+def run_job(job) -> deque | Exception:
+    try:
+        if worker_program is None:
+            bf, inputs = (job, tuple()) if isinstance(job, str) else job
+        else:
+            bf, inputs = worker_program, job
+        return worker_engine(bf, inputs)
+    except Exception as e:
+        return e
+
+
+# Executes a batch of jobs over a pool of worker processes, returning the outputs of each job (or the exception it raised) in order
+# If bf is given every job is a set of inputs for that program, otherwise every job is a program or a (program, inputs) pair
+# Workers keep their own compile cache, so each distinct program is only compiled once per worker
+def execute_many(jobs: Iterable, workers: int | None = None, bf: str | None = None, engine: Callable = execute, chunksize: int = 16) -> List[deque | Exception]:
+    from multiprocessing import Pool
+    with Pool(workers, initializer=init_worker, initargs=(bf, engine)) as pool:
+        return list(pool.imap(run_job, jobs, chunksize=chunksize))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,285 @@
+from collections import deque
+from typing import Tuple, List, Dict
+import os
+import marshal
+import json
+import zlib
+import numpy as np
+from fast_compiler import ENGINE_VERSION, Frame, tape_pool
+
+
+# Counts how often each op runs, how many iterations each loop makes and how many times each function is called
+# Counters are arrays indexed by op, and are only mapped back to source positions when exported
+class Profile:
+
+    def __init__(self) -> None:
+        self.program = None
+        self.positions = []
+        self.ops = np.zeros(0, dtype=np.int64)
+        self.loops = np.zeros(0, dtype=np.int64)
+        self.calls = np.zeros(0, dtype=np.int64)
+
+    # Sizes the counters for a program, keeping them if the program was already being profiled so runs accumulate
+    def bind(self, bf: str, positions: List[int]) -> None:
+        if self.program != bf:
+            self.program = bf
+            self.positions = positions
+            self.ops = np.zeros(len(positions), dtype=np.int64)
+            self.loops = np.zeros(len(positions), dtype=np.int64)
+            self.calls = np.zeros(len(positions), dtype=np.int64)
+
+    # Maps the nonzero entries of a counter to [source position, count] pairs
+    def by_position(self, counter: np.ndarray) -> List[List[int]]:
+        return [[self.positions[i], int(counter[i])] for i in np.flatnonzero(counter)]
+
+    # Returns the counters by source position, where each op is counted at the first character it was compiled from
+    def to_dict(self) -> Dict[str, int | List[List[int]]]:
+        return {
+            "total": int(self.ops.sum()),
+            "ops": self.by_position(self.ops),
+            "loops": self.by_position(self.loops),
+            "calls": self.by_position(self.calls),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    # Returns the source span of every op which ran with its hotness between 0 and 1, on a log scale relative to the hottest op
+    def hotness(self) -> List[Tuple[int, int, float]]:
+        if not self.ops.any():
+            return []
+        scale = np.log1p(self.ops.max())
+        ends = self.positions[1:] + [len(self.program)]
+        return [(self.positions[i], ends[i], float(np.log1p(self.ops[i]) / scale)) for i in np.flatnonzero(self.ops)]
+
+
+# Kinds of trace record - an op which ran, a cell written by MULTIPLY, and a function scope being entered at | or left at }
+STEP, WRITE, PUSH, POP = range(4)
+
+# Layout of a trace record, where cell is the cell the record wrote (before and after are its value either side) or -1
+TRACE_DTYPE = np.dtype([
+    ("kind", np.uint8),
+    ("position", np.int32),
+    ("depth", np.int32),
+    ("cell_ptr", np.int32),
+    ("cell", np.int32),
+    ("before", np.uint8),
+    ("after", np.uint8),
+])
+
+
+# Records every op that runs into a preallocated ring buffer, keeping only the most recent capacity records
+# Each op stores the pointer it ran at and the value of that cell before and after, so any point still held can be rebuilt by replaying them
+# An op's after value is only known once it has run, so it is filled in when the next record is made
+class Trace:
+
+    def __init__(self, capacity: int = 1_000_000) -> None:
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype=TRACE_DTYPE)
+        self.kinds = self.records["kind"]
+        self.positions = self.records["position"]
+        self.depths = self.records["depth"]
+        self.cell_ptrs = self.records["cell_ptr"]
+        self.cells = self.records["cell"]
+        self.befores = self.records["before"]
+        self.afters = self.records["after"]
+        self.count = 0
+        self.top = None
+        self.pending = -1
+        self.mem = None
+        self.cell_ptr = 0
+        self.position = 0
+        self.depth = 0
+
+    # Starts a new trace for a run, keeping the top level tape so history can be unwound from its live state
+    def bind(self, top: bytearray) -> None:
+        self.top = top
+        self.count = 0
+        self.pending = -1
+
+    # Starts a new trace partway through a run, as ops are only traced while the debugger is stepping through them
+    # Each scope in progress is entered afresh at its saved pointer, with its cells written in, so its history can be rebuilt from here on
+    def start(self, frames: deque, position: int) -> None:
+        self.bind(frames[0].mem)
+        self.position = position
+        for depth, frame in enumerate(frames):
+            self.add(PUSH, position, depth, frame.cell_ptr, -1, 0, 0)
+            if depth:
+                for cell in np.flatnonzero(np.frombuffer(frame.mem, dtype=np.uint8)):
+                    self.add(WRITE, position, depth, frame.cell_ptr, int(cell), 0, frame.mem[cell])
+
+    # Number of records still held
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    # Appends a record, overwriting the oldest once the buffer is full
+    def add(self, kind: int, position: int, depth: int, cell_ptr: int, cell: int, before: int, after: int) -> int:
+        slot = self.count % self.capacity
+        self.kinds[slot] = kind
+        self.positions[slot] = position
+        self.depths[slot] = depth
+        self.cell_ptrs[slot] = cell_ptr
+        self.cells[slot] = cell
+        self.befores[slot] = before
+        self.afters[slot] = after
+        self.count += 1
+        return slot
+
+    # Fills in the after value of the last op, from the tape it ran on
+    def settle(self) -> None:
+        if self.pending >= 0:
+            self.afters[self.pending] = self.mem[self.cell_ptr]
+            self.pending = -1
+
+    # Records an op which is about to run
+    def step(self, position: int, mem: bytearray, cell_ptr: int, depth: int) -> None:
+        self.settle()
+        value = mem[cell_ptr]
+        self.pending = self.add(STEP, position, depth, cell_ptr, cell_ptr, value, value)
+        self.mem = mem
+        self.cell_ptr = cell_ptr
+        self.position = position
+        self.depth = depth
+
+    # Records a cell other than the one at the pointer being written by the op which is running
+    def write(self, cell: int, before: int, after: int) -> None:
+        self.add(WRITE, self.position, self.depth, self.cell_ptr, cell, before, after)
+
+    # Records a function scope being entered, at the depth of the new scope
+    def push(self, depth: int) -> None:
+        self.add(PUSH, self.position, depth, 0, -1, 0, 0)
+
+    # Records a function scope being left, settling its last op first as its tape is about to be zeroed
+    def pop(self) -> None:
+        self.settle()
+        self.add(POP, self.position, self.depth, self.cell_ptr, -1, 0, 0)
+
+    # Returns the records held, oldest first
+    def ordered(self) -> np.ndarray:
+        if self.count <= self.capacity:
+            return self.records[:self.count]
+        slot = self.count % self.capacity
+        return np.concatenate((self.records[slot:], self.records[:slot]))
+
+    # Finds the op the given number of steps back from the latest one, clamped to the oldest op held
+    def find(self, records: np.ndarray, back: int) -> int:
+        steps = np.flatnonzero(records["kind"] == STEP)
+        return int(steps[max(len(steps) - 1 - back, 0)])
+
+    # Returns where the pointer of the scope at the given depth was just before record i ran, which is where it was entered if no op has run in it since
+    def pointer(self, records: np.ndarray, i: int, depth: int) -> int:
+        kinds = records["kind"][:i + 1]
+        ops = np.flatnonzero(((kinds == STEP) | (kinds == PUSH)) & (records["depth"][:i + 1] == depth))
+        return int(records["cell_ptr"][ops[-1]]) if len(ops) else 0
+
+    # Rebuilds the tape of the scope at the given depth just before record i ran, or returns None if the records it needs are gone
+    # The top level is unwound from its live tape, while function tapes are replayed forwards from the zeroed tape they were entered with
+    def tape(self, records: np.ndarray, i: int, depth: int) -> np.ndarray | None:
+        writes = (records["kind"] <= WRITE) & (records["depth"] == depth)
+        if depth == 0:
+            writes[:i] = False
+            undone = records[writes]
+            tape = np.frombuffer(self.top, dtype=np.uint8).copy()
+            cells, first = np.unique(undone["cell"], return_index=True)
+            tape[cells] = undone["before"][first]
+            return tape
+
+        pushes = np.flatnonzero((records["kind"][:i + 1] == PUSH) & (records["depth"][:i + 1] == depth))
+        if not len(pushes):
+            return None
+        writes[:pushes[-1]] = False
+        writes[i:] = False
+        replayed = records[writes][::-1]
+        tape = np.zeros(30_000, dtype=np.uint8)
+        cells, last = np.unique(replayed["cell"], return_index=True)
+        tape[cells] = replayed["after"][last]
+        return tape
+
+
+# Saves the full state of a running programme as a compact binary checkpoint, which execute_stream can resume from without recomputing anything
+# Tapes are stored sparsely as the cells which aren't zero, and top level inputs as how many have been taken, so they must be passed again on resume
+# Given every, a checkpoint is taken every that many ops, and given a path, each checkpoint is written over the last one on disk
+# capture can also be called from a debugger hook, as the state is consistent whenever the debugger has control
+class Checkpointer:
+
+    def __init__(self, every: int | None = None, path: str | None = None) -> None:
+        self.every = every
+        self.path = path
+        self.latest = None
+        self.digest = None
+        self.scopes = None
+        self.op_ptr = 0
+
+    # Keeps references to the frames and call stacks of the running programme, which are captured as they are when a checkpoint is taken
+    def bind(self, digest: str, scopes: Tuple[deque, deque, deque, object]) -> None:
+        self.digest = digest
+        self.scopes = scopes
+
+    # Serialises the state of the programme as it is before the op at op_ptr runs
+    # The top level inputs and outputs are None in the frames and call stacks, so they need no special handling
+    def capture(self) -> bytes:
+        frames, call_stack, inputs_stack, top_inputs = self.scopes
+        saved_frames = []
+        for frame in frames:
+            tape = np.frombuffer(frame.mem, dtype=np.uint8)
+            cells = np.flatnonzero(tape).astype(np.uint16)
+            saved_frames.append((
+                cells.tobytes(),
+                tape[cells].tobytes(),
+                frame.cell_ptr,
+                frame.func,
+                as_list(frame.inputs),
+                as_list(frame.outputs),
+                frame.return_ptr,
+                frame.memo_key,
+            ))
+        state = (
+            ENGINE_VERSION,
+            self.digest,
+            self.op_ptr,
+            top_inputs.consumed,
+            saved_frames,
+            [(call_ptr, as_list(outputs)) for call_ptr, outputs in call_stack],
+            [as_list(inputs) for inputs in inputs_stack],
+        )
+        return zlib.compress(marshal.dumps(state))
+
+    # Takes a checkpoint, keeping it as latest and writing it to disk if there is a path
+    def save(self) -> bytes:
+        data = self.capture()
+        self.latest = data
+        if self.path:
+            with open(self.path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(self.path + ".tmp", self.path)
+        return data
+
+
+# Converts the inputs or outputs of a frame to and from something marshal can store, leaving None for the top level as it is
+def as_list(values: deque | None) -> List | None:
+    return None if values is None else list(values)
+
+
+def as_deque(values: List | None) -> deque | None:
+    return None if values is None else deque(values)
+
+
+# Rebuilds the frames and call stacks of a programme from a checkpoint, returning the op to carry on from and how many top level inputs were taken
+# The checkpoint must be of the same program, compiled the same way by the same engine version
+def restore_checkpoint(data: bytes, digest: str, scopes: Tuple[deque, deque, deque, object]) -> Tuple[int, int]:
+    try:
+        version, saved_digest, op_ptr, consumed, saved_frames, calls, inputs = marshal.loads(zlib.decompress(data))
+    except (zlib.error, EOFError, ValueError, TypeError):
+        raise ValueError("not a valid checkpoint") from None
+    if version != ENGINE_VERSION or saved_digest != digest:
+        raise ValueError("checkpoint was taken from a different program, engine version or debugging mode")
+
+    frames, call_stack, inputs_stack, _ = scopes
+    frames.clear()
+    for i, (cells, values, cell_ptr, func, frame_inputs, frame_outputs, return_ptr, memo_key) in enumerate(saved_frames):
+        mem = bytearray(30_000) if i == 0 else tape_pool.acquire()
+        np.frombuffer(mem, dtype=np.uint8)[np.frombuffer(cells, dtype=np.uint16)] = np.frombuffer(values, dtype=np.uint8)
+        frames.append(Frame(mem, cell_ptr, func, as_deque(frame_inputs), as_deque(frame_outputs), return_ptr, memo_key))
+    call_stack.extend((call_ptr, as_deque(outputs)) for call_ptr, outputs in calls)
+    inputs_stack.extend(as_deque(values) for values in inputs)
+    return op_ptr, consumed
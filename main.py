@@ -1,11 +1,12 @@
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Callable
+import re
 import tkinter as tk
+from tkinter import font as tkfont
 from tkmacosx import Button
 import numpy as np
-from threading import Thread, Event
 from collections import deque
-from time import sleep, time
 from pyperclip import copy
+from worker import Worker, PTR, FUNC_PTR, POSITION, DEPTH, STEPS, DELAY, PAUSED, TARGET_DEPTH, PAUSED_DEPTH, REWIND, SCRUB, SAVE, DEEPEST
 
 
 # Finds matching pairs of brackets/braces or any other given pair of chars in a string
@@ -22,6 +23,10 @@ def build_brace_map(bf: str, braces: Tuple[str, str]) -> Dict[int, int]:
     return brace_map
 
 
+# Matches runs of the same command, so each run can be coloured with a single tag range
+COMMAND_RUNS = re.compile(r"([\[\]{}()|<>+\-.,#])\1*")
+
+
 # Places custom borders around widgets by creating a container frame for them with the borders
 class Border(tk.Frame):
 
@@ -65,6 +70,140 @@ class Border(tk.Frame):
                         v_border.pop().grid(row=i[0], column=1, sticky="news")
 
 
+# Keeps the positions of every bracket in the code up to date as it is edited, so the matching bracket can be found without rescanning the text
+# Brackets after an edit are shifted in one vectorised step, along with the index of the bracket each is paired with
+# Pairs are only worked out again from the first edited bracket when next needed, stopping as soon as the brackets left open are the same as they were before the edits
+class BracketIndex:
+
+    brackets = {"[": 1, "]": -1, "{": 2, "}": -2, "(": 3, ")": -3}
+
+    def __init__(self) -> None:
+        self.positions = np.zeros(0, dtype=np.int64)
+        self.codes = np.zeros(0, dtype=np.int8)
+        self.partners = np.zeros(0, dtype=np.int64)
+        self.edited = None
+        self.opened = None
+        self.removed = 0
+
+    # Indexes a whole piece of text from scratch
+    def reset(self, text: str) -> None:
+        self.positions = np.zeros(0, dtype=np.int64)
+        self.codes = np.zeros(0, dtype=np.int8)
+        self.partners = np.zeros(0, dtype=np.int64)
+        self.edited = None
+        self.opened = None
+        self.insert(0, text)
+
+    # Shifts the brackets after the inserted text along and adds any brackets within it, unpaired until next needed
+    def insert(self, offset: int, text: str) -> None:
+        i = int(np.searchsorted(self.positions, offset))
+        self.positions[i:] += len(text)
+        new = [(offset + j, self.brackets[c]) for j, c in enumerate(text) if c in self.brackets]
+        if new:
+            self.mark(i, i, len(new))
+            self.partners[self.partners >= i] += len(new)
+            self.positions = np.insert(self.positions, i, [position for position, _ in new])
+            self.codes = np.insert(self.codes, i, [code for _, code in new])
+            self.partners = np.insert(self.partners, i, [-1] * len(new))
+
+    # Removes any brackets between start and end and shifts the brackets after them back, leaving the brackets they were paired with unpaired
+    def delete(self, start: int, end: int) -> None:
+        i = int(np.searchsorted(self.positions, start))
+        j = int(np.searchsorted(self.positions, end))
+        self.positions = np.delete(self.positions, np.s_[i:j])
+        self.positions[i:] -= end - start
+        if j > i:
+            self.mark(i, j, 0)
+            partners = np.delete(self.partners, np.s_[i:j])
+            partners[(partners >= i) & (partners < j)] = -1
+            partners[partners >= j] -= j - i
+            self.partners = partners
+            self.codes = np.delete(self.codes, np.s_[i:j])
+
+    # Returns the brackets of each kind left open just before the bracket at index end, going by the pairs before it
+    def open_before(self, end: int) -> Dict[int, List[int]]:
+        partners = self.partners[:end]
+        codes = self.codes[:end]
+        indices = np.flatnonzero((codes > 0) & ((partners >= end) | (partners < 0)))
+        kinds = codes[indices]
+        return {kind: indices[kinds == kind].tolist() for kind in (1, 2, 3)}
+
+    # Moves the end of the edited brackets on to the given index, following the unedited brackets in between as they were paired before
+    def advance(self, end: int) -> None:
+        start, stop = self.edited
+        opened = self.opened
+        for i, code in zip(range(stop, end), self.codes[stop:end].tolist()):
+            if code > 0:
+                opened[code].append(i)
+            elif opened[-code]:
+                opened[-code].pop()
+        self.edited = (start, end)
+
+    # Records brackets start to end being replaced by added new ones, before the arrays are changed
+    # The edited brackets are kept as one range, along with the brackets which were left open at its end before any of the edits
+    # Open brackets which are deleted are kept as unique negative stand-ins, so the brackets left open can never look the same as they were without them
+    def mark(self, start: int, end: int, added: int) -> None:
+        if self.edited is None:
+            self.opened = self.open_before(end)
+            self.edited = (start, end)
+        elif end > self.edited[1]:
+            self.advance(end)
+        first, last = self.edited
+        shift = added - (end - start)
+        for stack in self.opened.values():
+            for n, i in enumerate(stack):
+                if i >= end:
+                    stack[n] = i + shift
+                elif i >= start:
+                    self.removed -= 1
+                    stack[n] = self.removed
+        self.edited = (min(first, start), last + shift)
+
+    # Pairs up the brackets again from the first edited one, keeping any which don't have a pair
+    # Once past the edited brackets, every pair from the point where the same brackets are left open as before the edits is unchanged
+    def pair(self) -> None:
+        if self.edited is None:
+            return
+        start, end = self.edited
+        opened = self.opened
+        stacks = self.open_before(start)
+        partners = self.partners
+        for i, code in enumerate(self.codes[start:].tolist(), start):
+            if i >= end:
+                if stacks == opened:
+                    break
+                if code > 0:
+                    opened[code].append(i)
+                elif opened[-code]:
+                    opened[-code].pop()
+            if code > 0:
+                stacks[code].append(i)
+            elif stacks[-code]:
+                other = stacks[-code].pop()
+                partners[other] = i
+                partners[i] = other
+            else:
+                partners[i] = -1
+        else:
+            for stack in stacks.values():
+                partners[stack] = -1
+        self.edited = None
+        self.opened = None
+
+    # Returns the position of the bracket paired with the one at the given position, or None if there isn't one
+    def match(self, position: int) -> int | None:
+        self.pair()
+        i = int(np.searchsorted(self.positions, position))
+        if i < len(self.positions) and self.positions[i] == position and self.partners[i] >= 0:
+            return int(self.positions[self.partners[i]])
+        return None
+
+    # Returns the positions of brackets without a pair
+    def unbalanced(self) -> List[int]:
+        self.pair()
+        return self.positions[self.partners < 0].tolist()
+
+
 # Highest level widget, separating the code-based section and metadata on the code
 class MainApp(tk.Frame):
 
@@ -109,7 +248,7 @@ class Bf(tk.Frame):
 
     # Modifies lines when necessary
     def _on_change(self, event):
-        self.lines.redraw()
+        scheduler.request(self.lines.redraw)
 
 
 # Contains interactive widgets which can modify how and when code is run
@@ -126,6 +265,7 @@ class TopBar(tk.Frame):
         self.start = Button(self, bg="#00aa00", activebackground="#008800", command=lambda: root.event_generate("<<Run>>", when="tail"), width=0, borderless=1, focuscolor="")
         self.pause = Button(self, bg="#fa9c1b", activebackground="#f58216", command=lambda: root.event_generate("<<Pause>>", when="tail"), width=0, borderless=1, focuscolor="")
         self.kill = Button(self, bg="#ff3c32", activebackground="#ff2222", command=lambda: root.event_generate("<<Kill>>", when="tail"), width=0, borderless=1, focuscolor="")
+        self.profile = Button(self, bg="#8a5cf5", activebackground="#6f42c1", command=lambda: root.event_generate("<<Profile>>", when="tail"), width=0, borderless=1, focuscolor="")
 
         self.rowconfigure(0, weight=1)
         self.columnconfigure(0, weight=1)
@@ -133,6 +273,7 @@ class TopBar(tk.Frame):
         self.columnconfigure(2, weight=1)
         self.columnconfigure(3, weight=1)
         self.columnconfigure(4, weight=1)
+        self.columnconfigure(5, weight=1)
         self.delay_label_border.grid(row=0, column=0, sticky="news")
         self.delay_label.grid(row=1, column=1, sticky="news")
         self.delay_scale_border.grid(row=0, column=1, sticky="news")
@@ -140,6 +281,7 @@ class TopBar(tk.Frame):
         self.start.grid(row=0, column=2, sticky="news")
         self.pause.grid(row=0, column=3, sticky="news")
         self.kill.grid(row=0, column=4, sticky="news")
+        self.profile.grid(row=0, column=5, sticky="news")
 
 
 # Handles running and entry of code
@@ -149,15 +291,17 @@ class Code(tk.Text):
         super().__init__(parent, *args, **kwargs, highlightthickness=0)
         self.parent = parent
         self.config(insertbackground="#cccccc")
+
+        # Code runs in a worker process which publishes its memory through shared memory, read here without copying
+        # The worker blocks on its resumed event while paused, and a step releases it until it reaches an op no deeper than the target depth
+        self.worker = Worker()
+        self.header = self.worker.state.header
+        self.mem, self.func_mem = self.worker.state.mems
+        self.funcs, self.func_funcs = self.worker.state.funcs
+        self.profiling = False
         self.reset()
-        self.t = 0
-        self.paused = False
-        self.dead = False
-        self.closed = False
-        self.closing = tk.IntVar()
-        self.key = 0
-        self.event = Event()
-        self.event.set()
+        self.parent.top_bar.delay.trace_add("write", self.set_delay)
+        self.after(16, self.poll)
         self.tag_config("exe_char", background="#555555")
         self.tag_config("error_char", background="#ff4f4b", foreground="#ffffff")
 
@@ -165,6 +309,11 @@ class Code(tk.Text):
         root.bind("<<Run>>", self.start)
         root.bind("<<Pause>>", self.pause)
         root.bind("<<Kill>>", self.kill)
+        root.bind("<F5>", self.resume)
+        root.bind("<F10>", self.step_over)
+        root.bind("<F11>", self.step_into)
+        root.bind("<Shift-F11>", self.step_back)
+        root.bind("<<Profile>>", self.profile)
 
         # Enacts syntax highlighting
         self.colourmap = {
@@ -183,15 +332,26 @@ class Code(tk.Text):
             ",": "#ff781f",
             "#": "#ffffa0",
         }
-        self.bind("<KeyRelease>", self.syntax_highlight, add="+")
         for c in self.colourmap:
             self.tag_config(c, foreground=self.colourmap[c])
 
+        # Edited lines are collected by the proxy and highlighted together shortly after, so bursts of keystrokes only cost one pass
+        self.dirty = None
+        self.highlight_job = None
+
+        # Shades characters by how often they ran when the code is profiled, below every other tag so highlighting still shows
+        self.heatmap = ("#3a3434", "#413535", "#483636", "#503737", "#583838", "#623838", "#6c3838", "#783737", "#853535", "#933232")
+        for i, colour in enumerate(self.heatmap):
+            self.tag_config(f"heat{i}", background=colour)
+            self.tag_lower(f"heat{i}")
+
         # Highlights the pair of brackets the cursor is on
         self.tag_config("cursor", background="#555555", foreground="#ffffa0")
-        self.bind("<KeyRelease>", self.cursor_highlight, add="+")
+        self.tag_config("unbalanced", foreground="#ff4f4b", underline=True)
+        self.brackets = BracketIndex()
+        self.bind("<KeyRelease>", lambda _: scheduler.request(self.cursor_highlight), add="+")
         self.bind("<<Selection>>", lambda _: self.tag_remove("cursor", "1.0", "end"), add="+")
-        self.bind("<ButtonRelease-1>", self.cursor_highlight)
+        self.bind("<ButtonRelease-1>", lambda _: scheduler.request(self.cursor_highlight))
         self.bind("<Key>", self.double_brackets, add="+")
         self.bind("<BackSpace>", self.double_backspace)
 
@@ -205,84 +365,172 @@ class Code(tk.Text):
 
     # Resets attributes to default
     def reset(self):
-        self.mem = np.zeros(30_000, dtype=np.uint8)
+        self.worker.state.reset()
+        self.set_delay()
+        self.steps = 0
         self.ptr = 0
-        self.funcs = {}
-        self.func_mem = np.zeros(30_000, dtype=np.uint8)
         self.func_ptr = 0
-        self.func_funcs = {}
         root.event_generate("<<Redraw>>")
         root.event_generate("<<RedrawFunc>>")
 
-    # Initiates the thread to run code
+    # Passes the delay on to the worker whenever it is changed
+    def set_delay(self, *args) -> None:
+        self.header[DELAY] = self.parent.top_bar.delay.get()
+
+    # Whether the running code is paused, which lives in the shared header so the worker sees it too
+    @property
+    def paused(self) -> bool:
+        return bool(self.header[PAUSED])
+
+    # Sends the code to the worker, cancelling any run already in progress
     def start(self, event: tk.Event) -> None:
-        self.key += 1
-        self.dead = False
-        self.paused = False
-        self.outputs = []
+        if self.worker.busy:
+            self.worker.kill()
+        self.profiling = False
         self.reset()
-        self.parent.parent.info.output_box.config(text="Outputs: ")
+        self.parent.parent.info.output_box.clear()
         self.tag_remove("exe_char", "1.0", "end")
         self.tag_remove("error_char", "1.0", "end")
+        self.clear_heatmap()
         bf = self.get("1.0", "end-1c")
-        inputs = tuple((ord(i) if "\\" not in i else int(i[1:]) for i in self.parent.parent.info.input.get()[8:].split(" ")))
+        inputs = self.read_inputs()
         print(inputs)
-        if self.parent.top_bar.delay.get() or "#" in bf:
-            self.t = Thread(target=self.run_bf, args=(bf, self.key, inputs))
-            self.t.start()
-        else:
-            self.run_bf(bf, self.key, inputs)
-
-    # Pauses the execution of code
-    def pause(self, event: tk.Event) -> None:
-        self.paused = not self.paused
-
-    # Ends the execution of code and kills the thread
-    def kill(self, event: tk.Event) -> None:
-        self.dead = True
+        self.worker.submit(bf, inputs)
+
+    # Parses the inputs bar, where each space separated token is a character or a backslash followed by a number, into the bytes the programme reads
+    def read_inputs(self) -> bytes:
+        return bytes(ord(i) if "\\" not in i else int(i[1:]) for i in self.parent.parent.info.input.get()[8:].split(" "))
+
+    # Runs the code at full speed in the worker while profiling it, which shades each character by how hot it was once it finishes
+    def profile(self, event: tk.Event) -> None:
+        if self.worker.busy:
+            self.worker.kill()
+        self.profiling = True
+        self.clear_heatmap()
+        self.tag_remove("exe_char", "1.0", "end")
+        self.tag_remove("error_char", "1.0", "end")
+        self.parent.parent.info.output_box.clear()
+        self.worker.submit(self.get("1.0", "end-1c"), self.read_inputs(), profiling=True)
+
+    # Shades each character by how hot it was in the last profile
+    def show_heatmap(self, hotness: List[Tuple[int, int, float]]) -> None:
+        for start, end, heat in hotness:
+            self.tag_add(f"heat{min(int(heat * len(self.heatmap)), len(self.heatmap) - 1)}", f"1.0+{start}c", f"1.0+{end}c")
+
+    # Removes the shading left by the last profile
+    def clear_heatmap(self) -> None:
+        for i in range(len(self.heatmap)):
+            self.tag_remove(f"heat{i}", "1.0", "end")
+
+    # Pauses the execution of code, or resumes it if it is already paused
+    def pause(self, event: tk.Event | None = None) -> None:
+        if self.paused:
+            self.resume()
+        elif self.worker.busy and not self.profiling:
+            self.header[PAUSED] = 1
+            self.worker.resumed.clear()
+
+    # Carries on running paused code at full speed
+    def resume(self, event: tk.Event | None = None) -> None:
+        self.header[PAUSED] = 0
+        self.header[TARGET_DEPTH] = -1
+        self.worker.resumed.set()
+
+    # Runs paused code up to the next op, following it into any function it calls
+    # While scrubbed back through history, this steps forward through history instead
+    def step_into(self, event: tk.Event | None = None) -> None:
+        if self.paused and self.header[REWIND]:
+            self.scrub(self.header[REWIND] - 1)
+        elif self.paused:
+            self.header[TARGET_DEPTH] = DEEPEST
+            self.worker.resumed.set()
+
+    # Runs paused code up to the next op in the current scope, running any function it calls without stopping
+    def step_over(self, event: tk.Event | None = None) -> None:
+        if self.paused and self.header[REWIND]:
+            self.scrub(self.header[REWIND] - 1)
+        elif self.paused:
+            self.header[TARGET_DEPTH] = self.header[PAUSED_DEPTH]
+            self.worker.resumed.set()
+
+    # Steps paused code back to the op before the one being shown, by replaying the trace of the run
+    def step_back(self, event: tk.Event | None = None) -> None:
+        if self.paused:
+            self.scrub(self.header[REWIND] + 1)
+
+    # Asks the paused worker to checkpoint the programme to disk, so it can be resumed later without running it again
+    def save_session(self) -> None:
+        if self.paused:
+            self.header[SAVE] = 1
+            self.worker.resumed.set()
+
+    # Asks the paused worker to show the state from the given number of ops ago, where 0 is where it is paused
+    def scrub(self, back: int) -> None:
+        self.header[REWIND] = back
+        self.header[SCRUB] = 1
+        self.worker.resumed.set()
+
+    # Ends the execution of code by terminating the worker, however busy or blocked it is
+    def kill(self, event: tk.Event | None = None) -> None:
+        if self.worker.busy:
+            self.worker.kill()
+            self.reset()
+            self.tag_remove("exe_char", "1.0", "end")
 
     def close(self):
-        self.closing.set(1)
-        self.dead = True
-        if self.t and self.t.is_alive():
-            self.wait_variable(self.closing)
+        self.worker.close()
         root.destroy()
 
-    # Handles the colouring of characters each time a new character is entered
-    def syntax_highlight(self, event: tk.Event) -> None:
+    # Records the lines touched by an edit, which are highlighted in the next pass
+    def mark_dirty(self, first: int, last: int, added: int) -> None:
+        if self.dirty is None:
+            self.dirty = (first, last)
+        else:
+            # Lines added above the previously edited lines push them down
+            old_first, old_last = self.dirty
+            if first <= old_last:
+                old_last += added
+            self.dirty = (min(first, old_first), max(last, old_last))
+        if self.highlight_job is None:
+            self.highlight_job = self.after(30, self.syntax_highlight)
+
+    # Handles the colouring of the edited lines, tagging each run of the same command as a single range
+    def syntax_highlight(self) -> None:
+        self.highlight_job = None
+        if self.dirty is None:
+            return
+        first, last = self.dirty
+        self.dirty = None
+        start = f"{first}.0"
+        end = f"{last}.end"
         for tag in self.colourmap:
-            self.tag_remove(tag, "1.0", "end")
-        for i, c in enumerate(self.get("1.0", "end-1c")):
-            if c in self.colourmap:
-                self.tag_add(c, f"1.0+{i}c", f"1.0+{i + 1}c")
-
-    # Highlights the pair of braces the cursor is on
-    def cursor_highlight(self, event: tk.Event) -> None:
+            self.tag_remove(tag, start, end)
+        ranges = {}
+        for line, text in enumerate(self.get(start, end).split("\n"), first):
+            for run in COMMAND_RUNS.finditer(text):
+                ranges.setdefault(run.group()[0], []).extend((f"{line}.{run.start()}", f"{line}.{run.end()}"))
+        for tag, indices in ranges.items():
+            self.tag_add(tag, *indices)
+
+    # Highlights the pair of braces the cursor is on, and any brackets without a pair
+    def cursor_highlight(self, event: tk.Event | None = None) -> None:
         self.tag_remove("cursor", "1.0", "end")
-        loops = build_brace_map(self.get("1.0", "end-1c"), ("[", "]"))
-        loops.update(build_brace_map(self.get("1.0", "end-1c"), ("{", "}")))
-        loops.update(build_brace_map(self.get("1.0", "end-1c"), ("(", ")")))
-        cursor = self.count("1.0", "insert")
-        if cursor is None:
-            cursor = 0
-        else:
-            cursor = cursor[0]
-        brackets = True
-        if cursor - 1 in list(loops.values()):
-            cursor -= 1
-            other = [key for key, value in loops.items() if value == cursor][0]
-        elif cursor in list(loops.values()):
-            other = [key for key, value in loops.items() if value == cursor][0]
-        elif cursor in loops:
-            other = loops[cursor]
-        elif cursor - 1 in loops:
-            cursor -= 1
-            other = loops[cursor]
-        else:
-            brackets = False
-        if brackets and self.index("sel.first") == "None":
-            self.tag_add("cursor", f"1.0+{str(cursor)}c")
-            self.tag_add("cursor", f"1.0+{str(other)}c")
+        self.tag_remove("unbalanced", "1.0", "end")
+        for position in self.brackets.unbalanced():
+            self.tag_add("unbalanced", f"1.0+{position}c")
+        cursor = self.offset("insert")
+        for position in (cursor - 1, cursor):
+            other = self.brackets.match(position)
+            if other is not None:
+                if self.index("sel.first") == "None":
+                    self.tag_add("cursor", f"1.0+{position}c")
+                    self.tag_add("cursor", f"1.0+{other}c")
+                break
+
+    # Counts the characters before an index, bypassing the proxy since it is used while an edit is being handled
+    def offset(self, index: str) -> int:
+        count = self.tk.call(self._orig, "count", "-chars", "1.0", index)
+        return min(int(count or 0), int(self.tk.call(self._orig, "count", "-chars", "1.0", "end-1c") or 0))
 
     # Enters 2 braces at once and places cursor between them
     def double_brackets(self, event: tk.Event) -> str | None:
@@ -330,16 +578,39 @@ class Code(tk.Text):
             copy(self.selection_get())
             self.delete("sel.first", "sel.last")
             return "break"
+        elif event.state == 8 and event.keysym == "s":
+            self.save_session()
+            return "break"
 
     # Complex tcl, stolen shamelessly from Bryan Oakley
     def _proxy(self, *args):
-        # let the actual widget perform the requested action
+        # let the actual widget perform the requested action, noting where an edit starts and ends before it moves
         cmd = (self._orig,) + args
         try:
+            if args[0] in ("insert", "replace", "delete"):
+                line = int(self.tk.call(self._orig, "index", args[1]).split(".")[0])
+                start = self.offset(args[1])
+                if args[0] != "insert":
+                    end = self.offset(args[2]) if len(args) > 2 else start + 1
             result = self.tk.call(cmd)
         except tk.TclError:
             return
 
+        # keeps the bracket index in step with the edit, rebuilding it for the rare deletes of several ranges at once
+        if args[0] == "delete" and len(args) > 3:
+            self.brackets.reset(self.tk.call(self._orig, "get", "1.0", "end-1c"))
+        elif args[0] in ("replace", "delete"):
+            self.brackets.delete(start, max(start, end))
+        if args[0] in ("insert", "replace"):
+            self.brackets.insert(start, "".join(args[(2 if args[0] == "insert" else 3)::2]))
+
+        # queues the edited lines for syntax highlighting
+        if args[0] in ("insert", "replace"):
+            added = sum(text.count("\n") for text in args[(2 if args[0] == "insert" else 3)::2])
+            self.mark_dirty(line, line + added, added)
+        elif args[0] == "delete":
+            self.mark_dirty(line, line, 0)
+
         # generate an event if something was added or deleted, or the cursor position changed
         if (
             args[0] in ("insert", "replace", "delete") or
@@ -354,207 +625,45 @@ class Code(tk.Text):
         # return what the actual widget returned
         return result
 
-    # Thread to be instantiated - runs the code. Passes metadata to Info, displays current characters being exeuted, and executes them
-    def run_bf(self, bf: str, key: int, inputs: Tuple[int] = tuple()) -> deque:
-        st = time()
-        # Waits for previous thread to die if program is rerun
-        self.event.wait()
-        self.event.clear()
-
-        # Declares key variables
-        loops = build_brace_map(bf, ("[", "]"))
-        funcs = build_brace_map(bf, ("{", "}"))
-        mem_scopes = deque([np.zeros(30_000, dtype=np.uint8)])
-        cell_ptr_scopes = deque([0])
-        func_scopes = deque([{}])
-        inputs_scopes = deque([deque(inputs)])
-        outputs_scopes = deque([deque()])
-        bf_ptr = 0
-        is_func = False
-        is_call = False
-        is_call2 = False
-
-        # Executes all commands
-        while bf_ptr < len(bf):
-
-            # Creates references to the current local scope
-            mem = mem_scopes[-1]
-            cell_ptr = cell_ptr_scopes[-1]
-            func = func_scopes[-1]
-            inputs = inputs_scopes[-1]
-            outputs = outputs_scopes[-1]
-            comment = False
-
-            # Executes current command
-            match bf[bf_ptr]:
-
-                case ">":
-                    # Increments cell pointer, handles wrapping, and updates stack (because integers for the pointer are immutable)
-                    cell_ptr += 1
-                    if cell_ptr == 30_000:
-                        cell_ptr = 0
-                    cell_ptr_scopes.pop()
-                    cell_ptr_scopes.append(cell_ptr)
-
-                case "<":
-                    # Decrements cell pointer, handles wrapping, and updates stack (because integers for the pointer are immutable)
-                    cell_ptr -= 1
-                    if cell_ptr == -1:
-                        cell_ptr = 29_999
-                    cell_ptr_scopes.pop()
-                    cell_ptr_scopes.append(cell_ptr)
-
-                case "+":
-                    # Increments value at cell and deletes any functions present in cell
-                    mem[cell_ptr] += 1
-                    if cell_ptr in func:
-                        func.pop(cell_ptr)
-
-                case "-":
-                    # Decrements value at cell and deletes any functions present in cell
-                    mem[cell_ptr] -= 1
-                    if cell_ptr in func:
-                        func.pop(cell_ptr)
-
-                case ",":
-                    # Passes input to memory or function memory
-                    if not inputs:
-                        self.tag_add("error_char", f"1.0+{bf_ptr}c")
-                        break
-                    inp = inputs.popleft()
-                    if isinstance(inp, int):
-                        mem[cell_ptr] = inp
-                    else:
-                        mem[cell_ptr] = 0
-                        func[cell_ptr] = inp
-
-                case ".":
-                    # Outputs value or function at cell
-                    if is_func or (is_call and not is_call2):
-                        if cell_ptr in func:
-                            outputs.append(func[cell_ptr])
-                        else:
-                            outputs.append(int(mem[cell_ptr]))
-                    else:
-                        output = self.parent.parent.info.output_box
-                        output.config(text=output.cget("text") + chr(mem[cell_ptr]) + " ")
-
-                case "[" if mem[cell_ptr] == 0:
-                    # Moves to end of loop if cell is 0
-                    bf_ptr = loops[bf_ptr]
-
-                case "]" if mem[cell_ptr] != 0:
-                    # Moves to the beginning of loop if cell is not 0
-                    bf_ptr = loops[bf_ptr]
-
-                case "{":
-                    # Finds start and end characters of the function and stores these for when the function at this pointer is called
-                    mem[cell_ptr] = 0
-                    func[cell_ptr] = (bf_ptr, funcs[bf_ptr])
-                    bf_ptr = funcs[bf_ptr]
-
-                case "}":
-                    # Deletes the current function's local scopes and moves back to the function call
-                    mem_scopes.pop()
-                    cell_ptr_scopes.pop()
-                    func_scopes.pop()
-                    inputs_scopes.pop()
-                    outputs_scopes.pop()
-                    inputs_scopes.append(outputs)
-                    bf_ptr = call_ptr
-                    if not is_func:
-                        is_func = False
-                    is_call = True
-                    is_call2 = True
-
-                case "(":
-                    # Creates a new local scope for the first half of the function call's outputs and stores the cell pointer of the function being called
-                    if cell_ptr not in func:
-                        self.tag_add("error_char", f"1.0+{bf_ptr}c")
-                        break
-                    outputs_scopes.append(deque())
-                    call_ptr = cell_ptr
-                    is_call = True
-
-                case "|":
-                    # Moves to the beginning of the function which has been called and passes the outputs from the call as arguments to the function
-                    if not is_call:
-                        self.tag_add("error_char", f"1.0+{bf_ptr}c")
-                        break
-                    mem_scopes.append(np.zeros(30_000, dtype=np.uint8))
-                    cell_ptr_scopes.append(0)
-                    func_scopes.append({})
-                    inputs_scopes.append(outputs)
-                    outputs_scopes.pop()
-                    outputs_scopes.append(deque())
-                    bf_ptr, call_ptr = func[call_ptr][0], bf_ptr
-                    is_func = True
-                    is_call = False
-
-                case ")":
-                    if not is_call:
-                        self.tag_add("error_char", f"1.0+{bf_ptr}c")
-                        break
-                    inputs_scopes.pop()
-                    is_call = False
-                    is_call2 = False
-
-                case "#":
-                    self.paused = True
-
-                case _:
-                    comment = True
-
-            # Highlights current command and enacts delay
-            delay = self.parent.top_bar.delay.get()
-            if not comment and delay:
+    # Handles everything the worker has sent since the last frame, highlighting the command it stopped on and redrawing the memory it published
+    def poll(self) -> None:
+        output_box = self.parent.parent.info.output_box
+        for kind, value in self.worker.poll():
+            if kind == "outputs":
+                output_box.write("".join(format_output(output) + " " for output in value))
+            elif kind == "error":
+                if hasattr(value, "position"):
+                    self.tag_add("error_char", f"1.0+{value.position}c")
+                print(value)
+            elif kind == "profile":
+                self.show_heatmap(value)
+            elif kind == "done":
+                print(value)
                 self.tag_remove("exe_char", "1.0", "end")
-                self.tag_add("exe_char", f"1.0+{bf_ptr}c")
-                sleep(delay / 20)
-                if is_func:
-                    self.func_mem = mem
-                    self.func_ptr = cell_ptr
-                    self.func_funcs = func
-                    root.event_generate("<<RedrawFunc>>", when="tail")
-                else:
-                    self.mem = mem
-                    self.ptr = cell_ptr
-                    self.funcs = func
-                    root.event_generate("<<Redraw>>", when="tail")
 
-            # Increments code pointer to execute next command
-            bf_ptr += 1
-
-            # Gracefully kills thread if thread is rerun or stopped
-            if self.dead or self.key != key:
-                self.reset()
-                break
+        steps = int(self.header[STEPS])
+        if steps != self.steps and self.worker.busy:
+            self.steps = steps
+            self.tag_remove("exe_char", "1.0", "end")
+            self.tag_add("exe_char", f"1.0+{int(self.header[POSITION])}c")
+            if self.header[REWIND]:
+                # Both scopes may have been rebuilt from history
+                self.ptr = int(self.header[PTR])
+                self.func_ptr = int(self.header[FUNC_PTR])
+                root.event_generate("<<Redraw>>", when="tail")
+                root.event_generate("<<RedrawFunc>>", when="tail")
+            elif self.header[DEPTH]:
+                self.func_ptr = int(self.header[FUNC_PTR])
+                root.event_generate("<<RedrawFunc>>", when="tail")
+            else:
+                self.ptr = int(self.header[PTR])
+                root.event_generate("<<Redraw>>", when="tail")
+        self.after(16, self.poll)
 
-            # Pauses thread if paused and enacts closing and killing if necessary
-            if self.paused:
-                self.tag_remove("exe_char", "1.0", "end")
-                self.tag_add("exe_char", f"1.0+{bf_ptr-1}c", f"1.0+{bf_ptr}c")
-                if is_func:
-                    self.func_mem = mem
-                    self.func_ptr = cell_ptr
-                    self.func_funcs = func
-                    root.event_generate("<<RedrawFunc>>", when="tail")
-                else:
-                    self.mem = mem
-                    self.ptr = cell_ptr
-                    self.funcs = func
-                    root.event_generate("<<Redraw>>", when="tail")
-            while self.paused:
-                if self.dead or self.key != key:
-                    self.reset()
-                    break
 
-        print(time() - st)
-        self.tag_remove("exe_char", "1.0", "end")
-        self.event.set()
-        if self.closing.get() == 1:
-            self.closing.set(0)
-        return outputs_scopes[0]
+# Formats an output for the outputs bar, where functions are shown by the position they start at
+def format_output(value: int | Tuple[int, int]) -> str:
+    return chr(value) if isinstance(value, int) else f"f{value[0]}"
 
 
 # Displays and updates lines on the sidebar
@@ -564,16 +673,18 @@ class Lines(tk.Canvas):
         super().__init__(parent, *args, **kwargs, highlightthickness=0)
         self.parent = parent
         self.code = None
+        self.items = []
+        self.labels = []
 
     # Stores the code widget as an attribute to read and capture events
     def attach(self, text_widget: tk.Text) -> None:
         self.code = text_widget
 
     # Redraws lines when the code is modified, stolen shamelessly from Bryan Oakley
+    # Text items are kept between redraws and only moved or relabelled, with any left over hidden
     def redraw(self, *args) -> None:
         # redraw line numbers
-        self.delete("all")
-
+        n = 0
         i = self.code.index("@0,0")
         while True:
             dline = self.code.dlineinfo(i)
@@ -582,9 +693,45 @@ class Lines(tk.Canvas):
             y = dline[1]
             linenum = str(i).split(".")[0]
             linenum = linenum.rjust(4)
-            self.create_text(2, y, anchor="nw", text=linenum, font=("Courier", 14), fill="grey")
+            if n == len(self.items):
+                self.items.append(self.create_text(2, y, anchor="nw", text=linenum, font=("Courier", 14), fill="grey"))
+                self.labels.append(linenum)
+            else:
+                self.coords(self.items[n], 2, y)
+                if self.labels[n] != linenum:
+                    self.itemconfig(self.items[n], text=linenum, state="normal")
+                    self.labels[n] = linenum
+                else:
+                    self.itemconfig(self.items[n], state="normal")
+            n += 1
             i = self.code.index("%s+1line" % i)
 
+        for item in self.items[n:]:
+            self.itemconfig(item, state="hidden")
+
+
+# Coalesces redraw requests, so each widget repaints at most once per frame however many events asked it to
+class Scheduler:
+
+    def __init__(self, widget: tk.Misc, interval: int = 16) -> None:
+        self.widget = widget
+        self.interval = interval
+        self.pending = {}
+        self.job = None
+
+    # Queues a redraw for the next frame, ignoring it if the same redraw is already queued
+    def request(self, callback: Callable[[], None]) -> None:
+        self.pending[callback] = None
+        if self.job is None:
+            self.job = self.widget.after(self.interval, self.run)
+
+    # Runs every redraw queued since the last frame
+    def run(self) -> None:
+        self.job = None
+        pending, self.pending = self.pending, {}
+        for callback in pending:
+            callback()
+
 
 # Separates memory displays, input and output bars
 class Info(tk.Frame):
@@ -597,7 +744,7 @@ class Info(tk.Frame):
         self.input_box.insert("1", "Inputs: ")
         self.input_box.bind("<BackSpace>", lambda _: "break" if self.input_box.index("insert") == 8 else None)
         self.output_border = Border(self, side="ns", bw=1)
-        self.output_box = tk.Label(self.output_border, bg="#333333", fg="#ffffff", text="Outputs: ", font=("Courier", 14), anchor="w", highlightthickness=0)
+        self.output_box = OutputBox(self.output_border, bg="#333333", fg="#ffffff", font=("Courier", 14), wrap="char", height=1, width=1, borderwidth=0)
         self.mem = MemDisplay(self, False, bg="#444444", fg="#ffffff", font=("Courier", 14), wrap="none")
         self.func_border = Border(self, side="ns", bw=1)
         self.func_mem = MemDisplay(self.func_border, True, bg="#444444", fg="#ffffff", font=("Courier", 14), wrap="none")
@@ -645,7 +792,44 @@ repository"""
         self.about.config(state="disabled")
 
 
+# Displays the outputs of the code, buffering writes from the code thread and appending them to the view at a bounded frame rate
+class OutputBox(tk.Text):
+
+    def __init__(self, parent: tk.Frame, *args, interval: int = 33, **kwargs) -> None:
+        super().__init__(parent, *args, **kwargs, highlightthickness=0)
+        self.parent = parent
+        self.interval = interval
+        self.pending = deque()
+        self.clear()
+        self.after(self.interval, self.flush)
+
+    # Queues text to be displayed, which is cheap enough to be called for every output and safe to call from the code thread
+    def write(self, text: str) -> None:
+        self.pending.append(text)
+
+    # Appends everything written since the last frame in one go, then schedules the next frame
+    def flush(self) -> None:
+        chunks = []
+        while self.pending:
+            chunks.append(self.pending.popleft())
+        if chunks:
+            self.config(state="normal")
+            self.insert("end-1c", "".join(chunks))
+            self.see("end")
+            self.config(state="disabled")
+        self.after(self.interval, self.flush)
+
+    # Removes all outputs, including any which haven't been displayed yet
+    def clear(self) -> None:
+        self.pending.clear()
+        self.config(state="normal")
+        self.delete("1.0", "end")
+        self.insert("1.0", "Outputs: ")
+        self.config(state="disabled")
+
+
 # Displays the memory in the current code thread, either for the main bf programme or for the current running function
+# Only the window of cells that fits in the widget is rendered, and cells are only rewritten when they change
 class MemDisplay(tk.Text):
 
     def __init__(self, parent: tk.Frame, func: bool, *args, **kwargs) -> None:
@@ -654,13 +838,22 @@ class MemDisplay(tk.Text):
         self.func = func
         self.config(state="disabled")
         self.tag_config("pointer", background="#666666")
+        self.char_width = tkfont.Font(font=self.cget("font")).measure("0")
+        self.start = None
+        self.cells = []
         self.rewrite()
-        root.bind("<<RedrawFunc>>" if self.func else "<<Redraw>>", self.rewrite)
+        root.bind("<<RedrawFunc>>" if self.func else "<<Redraw>>", lambda _: scheduler.request(self.rewrite))
+        self.bind("<Configure>", self.resize)
+
+    # Forces the whole window to be rendered again, as the number of cells which fit may have changed
+    def resize(self, event: tk.Event) -> None:
+        self.start = None
+        scheduler.request(self.rewrite)
 
     # Rewrites the memory each time its changed
     def rewrite(self, event: tk.Event | None = None) -> None:
 
-        # Retrieves the nonzero values currently in the memory
+        # Retrieves the memory currently being displayed
         if self.func:
             mem = self.parent.parent.parent.parent.bf.code.func_mem
             pointer = self.parent.parent.parent.parent.bf.code.func_ptr
@@ -669,43 +862,43 @@ class MemDisplay(tk.Text):
             mem = self.parent.parent.parent.bf.code.mem
             pointer = self.parent.parent.parent.bf.code.ptr
             funcs = self.parent.parent.parent.bf.code.funcs
-        non_zero = np.nonzero(mem)[0]
-        additional = np.append(np.array(list(funcs.keys()), dtype=np.uint), np.uint(pointer))
-        non_zero = np.insert(non_zero, np.searchsorted(non_zero, additional), additional)
 
-        # Finds the first and last memory values to display, accounting for negative nonzero indices
-        if (
-            non_zero[non_zero > 15_000].size > 0 and
-            (non_zero[non_zero <= 15_000].size == 0 or
-             non_zero[non_zero > 15_000][0] > non_zero[non_zero <= 15_000][-1] * 2)
-        ):
-            _min = non_zero[non_zero > 15_000][0] - 30_000
-            _max = non_zero[-1] - 29_999 if non_zero[non_zero <= 15_000].size == 0 else non_zero[non_zero <= 15_000][-1] + 1
-            if _max >= -10:
-                _max = 1
-            pointer -= _min + (30_000 if pointer > 15_000 else 0)
-        else:
-            _min = 0 if non_zero[0] < 10 else non_zero[0]
-            _max = non_zero[-1] + 1
-            pointer -= _min
+        # Works out how many cells fit, with indices above 15_000 treated as negative so the window can wrap around the start of the memory
+        columns = max(1, (self.winfo_width() // self.char_width - 9) // 7)
+        signed = pointer - 30_000 if pointer > 15_000 else pointer
 
-        # Displays the section of the memory between the first and last values
-        index = np.arange(_min, _max)
-        mem = mem[index]
+        # Recentres the window only when the pointer leaves it, otherwise only the cells which changed are rewritten
         self.config(state="normal")
+        if self.start is None or len(self.cells) != columns or not 0 <= signed - self.start < columns:
+            self.start = 0 if 0 <= signed < columns // 2 else signed - columns // 2
+            index = np.arange(self.start, self.start + columns)
+            self.cells = self.render(mem, funcs, index % 30_000)
+            self.delete("1.0", "end")
+            self.insert("1.0", f"   index|{'|'.join(str(i).rjust(6) for i in index)}\n")
+            self.insert("2.0", "_" * 8 + "|______" * columns + "\n")
+            self.insert("3.0", f"  memory|{'|'.join(self.cells)}\n")
+            self.insert("4.0", " " * 8 + "|      " * columns + "\n")
+        else:
+            cells = self.render(mem, funcs, np.arange(self.start, self.start + columns) % 30_000)
+            for i, (old, new) in enumerate(zip(self.cells, cells)):
+                if old != new:
+                    self.delete(f"3.{9 + i * 7}", f"3.{15 + i * 7}")
+                    self.insert(f"3.{9 + i * 7}", new)
+            self.cells = cells
+
+        # Moves the pointer highlight to the pointer's column
+        pointer = signed - self.start
         self.tag_remove("pointer", "1.0", "end")
-        self.delete("1.0", "end")
-        self.insert("1.0", f"   index|{'|'.join(str(i).rjust(6) for i in index)}\n")
-        self.insert("2.0", "_" * 8 + "|______" * (_max - _min) + "\n")
-        self.insert("3.0", f"  memory|{'|'.join((f'f{funcs[i][0]}'.rjust(6) if i in funcs else str(n).rjust(6)) for i, n in enumerate(mem))}\n")
-        self.insert("4.0", " " * 8 + "|      " * (_max - _min) + "\n")
-        self.tag_add("pointer", f"1.{9 + pointer * 7}", f"1.{15 + pointer * 7}")
-        self.tag_add("pointer", f"2.{9 + pointer * 7}", f"2.{15 + pointer * 7}")
-        self.tag_add("pointer", f"3.{9 + pointer * 7}", f"3.{15 + pointer * 7}")
-        self.tag_add("pointer", f"4.{9 + pointer * 7}", f"4.{15 + pointer * 7}")
-        self.see(f"1.{9 + 7 * (_max - _min)}")
+        for line in range(1, 5):
+            self.tag_add("pointer", f"{line}.{9 + pointer * 7}", f"{line}.{15 + pointer * 7}")
+        self.see(f"1.{15 + pointer * 7}")
         self.config(state="disabled")
 
+    # Formats the given cells, showing functions by the position they start at
+    @staticmethod
+    def render(mem: np.ndarray, funcs: np.ndarray, index: np.ndarray) -> List[str]:
+        return [f"f{f}".rjust(6) if f >= 0 else str(n).rjust(6) for f, n in zip(funcs[index].tolist(), mem[index].tolist())]
+
 
 if __name__ == "__main__":
 
@@ -715,6 +908,7 @@ if __name__ == "__main__":
     root.geometry(f"{root.winfo_screenwidth()}x{root.winfo_screenheight()}+0+0")
     root.rowconfigure(0, weight=1)
     root.columnconfigure(0, weight=1)
+    scheduler = Scheduler(root)
 
     # Instantiates main frame within the root
     main_app = MainApp(root, bd=0)
@@ -0,0 +1,109 @@
+from typing import Tuple, List
+import numpy as np
+from fast_compiler import ADD, MOVE, OPEN, CLOSE, CLEAR, MULTIPLY, SCAN, OUTPUT, INPUT, cache
+
+# The numba engine for pure brainfuck, kept apart from the interpreter so only programs run on it pay for importing numpy and numba
+# fast_compiler only imports this once it has found numba, but a broken install still leaves run_native as None
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+# Packs the op stream of pure brainfuck into int64 rows of (op, arg, first target, end of targets) for the numba engine
+# MULTIPLY keeps its inverse as the arg and its (offset, factor) pairs in a separate table, which the rows index into
+def encode_native(bf: str) -> Tuple[bytes, bytes, List[int]]:
+    ops, args, positions = cache.ops(bf)
+    code = np.zeros((len(ops), 4), dtype=np.int64)
+    targets = []
+    for i, (op, arg) in enumerate(zip(ops, args)):
+        code[i, 0] = op
+        if op == MULTIPLY:
+            inverse, pairs = arg
+            code[i, 1] = inverse
+            code[i, 2] = len(targets)
+            targets.extend(pairs)
+            code[i, 3] = len(targets)
+        else:
+            code[i, 1] = arg
+    return code.tobytes(), np.array(targets, dtype=np.int64).tobytes(), positions
+
+
+# Turns the bytes stored by the compile cache back into the arrays the numba engine runs on
+def load_native(compiled: Tuple[bytes, bytes, List[int]]) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    code, targets, positions = compiled
+    return np.frombuffer(code, dtype=np.int64).reshape(-1, 4), np.frombuffer(targets, dtype=np.int64).reshape(-1, 2), positions
+
+
+# Runs an encoded op stream of pure brainfuck over a uint8 tape, to be jitted by numba
+# Returns the outputs buffer, how much of it was written, and the op it stopped at, which is only short of the end if it ran out of inputs
+def run_encoded(code: np.ndarray, targets: np.ndarray, inputs: np.ndarray) -> Tuple[np.ndarray, int, int]:
+    mem = np.zeros(30_000, dtype=np.uint8)
+    outputs = np.empty(1024, dtype=np.uint8)
+    n_outputs = 0
+    n_inputs = 0
+    cell_ptr = 0
+    op_ptr = 0
+    n_ops = code.shape[0]
+    while op_ptr < n_ops:
+        op = code[op_ptr, 0]
+        arg = code[op_ptr, 1]
+
+        if op == ADD:
+            mem[cell_ptr] = (mem[cell_ptr] + arg) & 255
+
+        elif op == MOVE:
+            # Moves are normalised to be positive, so only wrapping past the end needs handling
+            cell_ptr += arg
+            if cell_ptr >= 30_000:
+                cell_ptr -= 30_000
+
+        elif op == OPEN:
+            if mem[cell_ptr] == 0:
+                op_ptr = arg
+
+        elif op == CLOSE:
+            if mem[cell_ptr] != 0:
+                op_ptr = arg
+
+        elif op == CLEAR:
+            mem[cell_ptr] = 0
+
+        elif op == MULTIPLY:
+            value = mem[cell_ptr]
+            if value != 0:
+                count = value * arg
+                for t in range(code[op_ptr, 2], code[op_ptr, 3]):
+                    target = ((cell_ptr + targets[t, 0]) % 30_000 + 30_000) % 30_000
+                    mem[target] = (mem[target] + count * targets[t, 1]) & 255
+                mem[cell_ptr] = 0
+
+        elif op == SCAN:
+            while mem[cell_ptr] != 0:
+                cell_ptr += arg
+                if cell_ptr >= 30_000:
+                    cell_ptr -= 30_000
+                elif cell_ptr < 0:
+                    cell_ptr += 30_000
+
+        elif op == OUTPUT:
+            # Doubles the outputs buffer whenever it fills up
+            if n_outputs == len(outputs):
+                grown = np.empty(len(outputs) * 2, dtype=np.uint8)
+                grown[:n_outputs] = outputs
+                outputs = grown
+            outputs[n_outputs] = mem[cell_ptr]
+            n_outputs += 1
+
+        elif op == INPUT:
+            if n_inputs == len(inputs):
+                return outputs, n_outputs, op_ptr
+            mem[cell_ptr] = inputs[n_inputs]
+            n_inputs += 1
+
+        op_ptr += 1
+    return outputs, n_outputs, n_ops
+
+
+# Jitted engine for pure brainfuck, or None if numba isn't installed
+run_native = njit(cache=True, nogil=True)(run_encoded) if njit else None
@@ -0,0 +1,162 @@
+import asyncio
+import os
+from pathlib import Path
+import pytest
+from fast_compiler import ENGINES, STALE_TEMP, BudgetExceeded, ByteOutputs, CallMemo, CompileCache, execute, execute_async, execute_interpreter, execute_stream
+from instruments import Checkpointer, Profile
+
+
+# Programmes every engine and mode is checked against the interpreter on, as (source, inputs)
+PURE = [
+    ("++++++++[>++++[>++>+++>+++>+<<<<-]>+>+>->>+[<]<-]>>.>---.+++++++..+++.>>.<-.<.+++.------.--------.>>+.>++.", b""),
+    (",[.,]", b"hello\0"),
+    ("+++[>+++[>+<-]<-]>>.<<+++++[->>>++<<<]>>>.", b""),
+    ("-[<]>.>+>+>+<<<[>]<.", b""),
+    (",[->+>++>+++<<<]>.>.>.", (7,)),
+    ("++[>+<-]>[>+>++<<-]>>[-<+>]<.", b""),
+]
+FUNCTIONS = [
+    ("{,.,.}>++>+++<<(>.>.|>,>,)<.>.", b""),
+    ("{,+.}>{,>,<(>.<|>,.<)}(<.>>+++.<|>,.<)", b""),
+    ("{,[->+>+<<]>[->+<]>.}>+++++<(>.<|>,.<)", b""),
+    ("{,.}>,<(>.<|>>,<<)>>.", (7,)),
+    ("+++[>++<-]>.{,+.}(>,[>+<-]>.|,.)<<+.", (9, 1)),
+    ("++++[>{,+.}(>+++.<|>,.<)<-]", b""),
+    ("{+}.>{--}.<.", b""),
+    ("{+}.,.", ((0, 2),)),
+    ("{,+.}>,(<.|>,.)", ((0, 4), 4, 9)),
+]
+BENCHMARKS = [
+    pytest.param((Path(__file__).parent / "benchmarks" / f"{name}.b").read_text(), b"", id=name)
+    for name in ("function_values", "many_calls", "deep_recursion")
+]
+PROGRAMMES = PURE + FUNCTIONS + BENCHMARKS
+
+
+# Takes a checkpoint every few ops, remembering how many outputs had been produced when each was taken
+class Recorder(Checkpointer):
+
+    def __init__(self, every: int, outputs: list) -> None:
+        super().__init__(every)
+        self.outputs = outputs
+        self.saved = []
+
+    def save(self) -> bytes:
+        data = super().save()
+        self.saved.append((data, len(self.outputs)))
+        return data
+
+
+@pytest.mark.parametrize("engine", list(ENGINES))
+@pytest.mark.parametrize("bf, inputs", PROGRAMMES)
+def test_engines(bf, inputs, engine):
+    expected = list(execute_interpreter(bf, inputs))
+    assert list(ENGINES[engine](bf, inputs)) == expected
+    outputs = ENGINES[engine](bf, inputs, outputs=ByteOutputs(4))
+    assert list(outputs) == expected
+    assert len(outputs) == len(expected)
+
+
+@pytest.mark.parametrize("bf, inputs", PROGRAMMES)
+def test_memo(bf, inputs):
+    expected = list(execute_interpreter(bf, inputs))
+    memo = CallMemo()
+    assert list(execute(bf, inputs, memo=memo)) == expected
+    assert list(execute(bf, inputs, memo=memo)) == expected
+
+
+@pytest.mark.parametrize("bf, inputs", PROGRAMMES)
+@pytest.mark.parametrize("memo", [False, True])
+def test_resume(bf, inputs, memo):
+    expected = list(execute_interpreter(bf, inputs))
+    profile = Profile()
+    execute(bf, inputs, profile=profile)
+    outputs = []
+    recorder = Recorder(max(int(profile.ops.sum()) // 40, 1), outputs)
+    for value in execute_stream(bf, inputs, memo=CallMemo() if memo else None, checkpointer=recorder):
+        outputs.append(value)
+    assert outputs == expected
+    for data, produced in recorder.saved:
+        resumed = execute(bf, inputs, memo=CallMemo() if memo else None, resume=data)
+        assert outputs[:produced] + list(resumed) == expected
+
+
+@pytest.mark.parametrize("bf, inputs", PROGRAMMES)
+def test_async(bf, inputs):
+    expected = list(execute_interpreter(bf, inputs))
+    assert list(asyncio.run(execute_async(bf, inputs, slice_ops=5))) == expected
+    assert list(asyncio.run(execute_async(bf, inputs, memo=CallMemo()))) == expected
+
+
+# Errors are raised with the same type and source position whichever way the programme is run
+@pytest.mark.parametrize("bf, inputs", [(",.,.", b"a"), ("+[>,]", b"abc"), ("{,.}(|,.)", b""), ("{,,}(.|)", b"")])
+def test_errors(bf, inputs):
+    with pytest.raises(Exception) as expected:
+        execute_interpreter(bf, inputs)
+    runs = [lambda: ENGINES[engine](bf, inputs) for engine in ENGINES]
+    runs.append(lambda: execute(bf, inputs, memo=CallMemo()))
+    runs.append(lambda: asyncio.run(execute_async(bf, inputs, slice_ops=3)))
+    for run in runs:
+        with pytest.raises(type(expected.value)) as raised:
+            run()
+        if getattr(raised.value, "position", None) is not None:
+            assert raised.value.position == expected.value.position
+
+
+# Outputs produced before an error are left in a given ByteOutputs by every engine
+@pytest.mark.parametrize("bf, inputs", [(",.,.", b"a"), ("+.[>,.]", b"abc"), ("+.{,.}(|,.)", b""), ("{,.}>+.<(>.<|,.,.)", b"")])
+def test_partial_outputs(bf, inputs):
+    expected = ByteOutputs()
+    with pytest.raises(Exception):
+        execute_interpreter(bf, inputs, outputs=expected)
+    assert len(expected)
+    for engine in ENGINES:
+        outputs = ByteOutputs(4)
+        with pytest.raises(Exception):
+            ENGINES[engine](bf, inputs, outputs=outputs)
+        assert list(outputs) == list(expected)
+
+
+# A second cache on the same directory loads what the first compiled rather than compiling it again
+def test_cache_disk(tmp_path):
+    bf = PURE[0][0]
+    CompileCache(path=str(tmp_path)).ops(bf)
+    builds = []
+    cache = CompileCache(path=str(tmp_path))
+    assert cache.lookup("ops", bf, lambda: builds.append(bf), lambda stream: stream) == CompileCache().ops(bf)
+    assert builds == []
+
+
+# Eviction and clearing only touch the cache's own files, and temporary files are swept once a crashed writer has left them long enough
+def test_cache_eviction(tmp_path):
+    other = tmp_path / "notes.txt"
+    other.write_text("not the cache's")
+    stale = tmp_path / f"{'0' * 64}.ops.crashed.tmp"
+    fresh = tmp_path / f"{'1' * 64}.ops.writing.tmp"
+    stale.write_bytes(b"")
+    fresh.write_bytes(b"")
+    old = os.stat(stale).st_mtime - STALE_TEMP - 1
+    os.utime(stale, (old, old))
+    cache = CompileCache(path=str(tmp_path), max_bytes=50)
+    for bf, _ in PURE[:3]:
+        cache.ops(bf)
+    assert sorted(path.suffix for path in tmp_path.iterdir()) == [".ops", ".tmp", ".txt"]
+    assert other.exists() and fresh.exists() and not stale.exists()
+    assert CompileCache(path=str(tmp_path)).read("ops", PURE[2][0]) is not None
+    cache.clear()
+    assert list(tmp_path.iterdir()) == [other]
+
+
+# A programme finishes if it takes no more ops than its budget, and is otherwise stopped before running a single op over it
+@pytest.mark.parametrize("slice_ops", [1, 3, 10, 10_000])
+@pytest.mark.parametrize("budget", [0, 1, 5, 11, 12, 13])
+def test_budget(budget, slice_ops):
+    bf = "+." * 6
+    outputs = asyncio.Queue()
+    if budget >= 12:
+        asyncio.run(execute_async(bf, outputs=outputs, slice_ops=slice_ops, budget=budget))
+        assert outputs.qsize() == 6
+    else:
+        with pytest.raises(BudgetExceeded):
+            asyncio.run(execute_async(bf, outputs=outputs, slice_ops=slice_ops, budget=budget))
+        assert outputs.qsize() == budget // 2
@@ -0,0 +1,90 @@
+import random
+from pathlib import Path
+import pytest
+from fast_compiler import ByteOutputs, execute, execute_interpreter, execute_numba
+
+pytest.importorskip("numba")
+
+
+# Pure brainfuck programmes the numba engine is checked against the interpreter on, as (source, inputs)
+PROGRAMMES = [
+    ("++++++++[>++++[>++>+++>+++>+<<<<-]>+>+>->>+[<]<-]>>.>---.+++++++..+++.>>.<-.<.+++.------.--------.>>+.>++.", b""),
+    (",[.,]", b"hello\0"),
+    ("-[<]>.>+>+>+<<<[>]<.", b""),
+    ("+>+>+>+>+<<<<[>>]<.<<<[<<]>>.", b""),
+    ("++++[->>>+++<<<]>>>[-<<<+++>>>]<<<.", b""),
+    (",[->+>++>+++<<<]>.>.>.", [7]),
+    ("<<<+++.>>>--.<.", b""),
+]
+BENCHMARKS = [
+    pytest.param((Path(__file__).parent / "benchmarks" / f"{name}.b").read_text(), (Path(__file__).parent / "benchmarks" / f"{name}.in").read_bytes() if name == "factor" else b"", id=name)
+    for name in ("hello", "scan", "nested_loops", "factor", "life")
+]
+
+
+# Generates a random pointer-balanced block of brainfuck which always halts
+# Every loop counts its own cell down once per pass, and nothing inside it touches that cell, so it runs at most 255 times
+def random_block(rng: random.Random, depth: int, protected: set) -> str:
+    code = []
+    offset = 0
+    for _ in range(rng.randint(1, 8)):
+        r = rng.random()
+        if r < 0.3:
+            step = rng.randint(-3, 3)
+            code.append(">" * step if step > 0 else "<" * -step)
+            offset += step
+        elif offset in protected:
+            continue
+        elif r < 0.6:
+            code.append(rng.choice("+-") * rng.randint(1, 5))
+        elif r < 0.7:
+            code.append(".")
+        elif r < 0.78:
+            code.append(",")
+        elif depth < 2:
+            inner = random_block(rng, depth + 1, {cell - offset for cell in protected} | {0})
+            code.append("[-" + inner + "]")
+    code.append("<" * offset if offset > 0 else ">" * -offset)
+    return "".join(code)
+
+
+@pytest.mark.parametrize("bf, inputs", PROGRAMMES + BENCHMARKS)
+def test_programmes(bf, inputs):
+    expected = list(execute_interpreter(bf, inputs))
+    assert list(execute_numba(bf, inputs)) == expected
+    assert list(execute_numba(bf, bytes(inputs), outputs=ByteOutputs(4))) == expected
+    assert list(execute(bf, inputs)) == expected
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_random(seed):
+    rng = random.Random(seed)
+    bf = "".join(random_block(rng, 0, set()) + rng.choice(("", ">", "<<")) for _ in range(4))
+    inputs = bytes(rng.randrange(256) for _ in range(rng.randint(0, 40)))
+    try:
+        expected = list(execute_interpreter(bf, inputs))
+    except IndexError as e:
+        with pytest.raises(IndexError) as raised:
+            execute_numba(bf, inputs)
+        assert raised.value.position == e.position
+        expected, outputs = ByteOutputs(), ByteOutputs(4)
+        with pytest.raises(IndexError):
+            execute_interpreter(bf, inputs, outputs=expected)
+        with pytest.raises(IndexError):
+            execute_numba(bf, inputs, outputs=outputs)
+        assert list(outputs) == list(expected)
+    else:
+        assert list(execute_numba(bf, inputs)) == expected
+        assert list(execute_numba(bf, memoryview(bytearray(inputs)))) == expected
+
+
+# Function syntax and inputs which aren't bytes are left to the interpreter
+@pytest.mark.parametrize("bf, inputs", [("{+}.", b""), (",.", [300]), (",.", [(0, 1)])])
+def test_fallback(bf, inputs):
+    try:
+        expected = list(execute_interpreter(bf, inputs))
+    except Exception as e:
+        with pytest.raises(type(e)):
+            execute_numba(bf, inputs)
+    else:
+        assert list(execute_numba(bf, inputs)) == expected
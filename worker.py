@@ -0,0 +1,276 @@
+from typing import Tuple, Dict, List, Iterable
+from multiprocessing import Process, Queue, Event, shared_memory
+from queue import Empty
+from time import sleep, time
+import os
+import numpy as np
+from fast_compiler import execute_stream, Debugger
+from instruments import Profile, Trace, Checkpointer, STEP
+
+
+MEMORY_SIZE = 30_000
+
+# Slots of the shared header - the worker writes the pointers and where it stopped, the IDE writes the controls
+# REWIND is how many ops back through the trace the IDE wants to see, and SCRUB asks the paused worker to show it
+# SAVE asks the paused worker to checkpoint the programme to SESSION_FILE
+PTR, FUNC_PTR, POSITION, DEPTH, STEPS, DELAY, PAUSED, TARGET_DEPTH, PAUSED_DEPTH, REWIND, SCRUB, SAVE = range(12)
+HEADER_SIZE = 12
+
+# Where a paused session is saved, which can be resumed by passing its contents to execute_stream with a debugger
+# It sits next to the source rather than in whatever directory the IDE was started from, unless BRAINFUNC_SESSION gives another path
+SESSION_FILE = os.path.abspath(os.environ.get("BRAINFUNC_SESSION", os.path.join(os.path.dirname(os.path.abspath(__file__)), "session.checkpoint")))
+
+# Stands in for stepping into every call, as no programme gets anywhere near this deep
+DEEPEST = 2 ** 62
+
+# Outputs are sent to the IDE in batches of up to this many, or sooner once this many seconds have passed since the last batch
+BATCH_SIZE = 4096
+BATCH_INTERVAL = 0.03
+
+
+# Tape, pointer and function table of the top level and of the running function, laid out in one block of shared memory
+# The IDE creates the block and reads straight out of it, while the worker attaches to it by name and writes snapshots into it
+class SharedState:
+
+    def __init__(self, name: str | None = None) -> None:
+        size = HEADER_SIZE * 8 + 2 * MEMORY_SIZE * 4 + 2 * MEMORY_SIZE
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.name = self.shm.name
+        self.header = np.ndarray(HEADER_SIZE, dtype=np.int64, buffer=self.shm.buf)
+        # Each function is stored by the position it starts at, with -1 for cells which don't hold one
+        self.funcs = np.ndarray((2, MEMORY_SIZE), dtype=np.int32, buffer=self.shm.buf, offset=HEADER_SIZE * 8)
+        self.mems = np.ndarray((2, MEMORY_SIZE), dtype=np.uint8, buffer=self.shm.buf, offset=HEADER_SIZE * 8 + 2 * MEMORY_SIZE * 4)
+        if name is None:
+            self.reset()
+
+    # Clears both tapes and function tables along with the controls
+    def reset(self) -> None:
+        self.header[:] = 0
+        self.header[TARGET_DEPTH] = -1
+        self.funcs.fill(-1)
+        self.mems.fill(0)
+
+    # Copies the scope being executed into the slot for its display, leaving its function table as it was if none is given
+    # Functions hold the ops they span, so positions is needed alongside func to find where they start in the source
+    def snapshot(self, position: int, mem: bytearray | np.ndarray, cell_ptr: int, func: Dict | None, depth: int, positions: List[int] | None = None) -> None:
+        scope = 1 if depth else 0
+        self.mems[scope] = mem
+        if func is not None:
+            funcs = self.funcs[scope]
+            funcs.fill(-1)
+            for cell, (start, _) in func.items():
+                funcs[cell] = positions[start]
+        header = self.header
+        header[PTR + scope] = cell_ptr
+        header[POSITION] = position
+        header[DEPTH] = depth
+        header[STEPS] += 1
+
+    # Releases the views before the block itself, unlinking it when called by the IDE which owns it
+    def close(self, unlink: bool = False) -> None:
+        del self.header, self.funcs, self.mems
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+# Collects the outputs of a run and sends them to the IDE in batches, as putting each one on the queue costs far more than the op which made it
+# Whatever is held is also sent when the programme pauses, errors or ends, so the IDE never waits on outputs it should already show
+class OutputBatch:
+
+    def __init__(self, results: Queue) -> None:
+        self.results = results
+        self.values = []
+        self.sent = time()
+
+    def append(self, value: int | Tuple[int, int]) -> None:
+        values = self.values
+        values.append(value)
+        if len(values) >= BATCH_SIZE or time() - self.sent >= BATCH_INTERVAL:
+            self.flush()
+
+    # Sends whatever has been collected, or sends it only if the last batch went out long enough ago
+    def flush(self, due: bool = False) -> None:
+        if due and time() - self.sent < BATCH_INTERVAL:
+            return
+        if self.values:
+            self.results.put(("outputs", self.values))
+            self.values = []
+        self.sent = time()
+
+
+# Connects a programme running in the worker to the IDE, reading the controls out of the shared header
+# Killing and rerunning is done by terminating the worker, so unlike the in-process debugger it never has to halt the programme itself
+# While paused, the IDE can scrub back through the ops run since it last started stepping, and it can save the session
+# Outputs held in the batch are sent before the programme blocks, and on the interrupt checks while it runs so a quiet programme's last outputs aren't held up
+class RemoteSession(Debugger):
+
+    def __init__(self, state: SharedState, resumed: Event, outputs: OutputBatch, trace: Trace | None = None, checkpointer: Checkpointer | None = None) -> None:
+        self.state = state
+        self.header = state.header
+        self.resumed = resumed
+        self.outputs = outputs
+        self.trace = trace
+        self.checkpointer = checkpointer
+
+    # Steps through the code while there is a delay or the code is paused, otherwise it runs at full speed
+    @property
+    def stepping(self) -> bool:
+        return bool(self.header[DELAY] or self.header[PAUSED])
+
+    # Makes the compiler start stepping again as soon as the code is paused
+    @property
+    def interrupt(self) -> bool:
+        if self.outputs.values:
+            self.outputs.flush(due=True)
+        return bool(self.header[PAUSED])
+
+    # Pauses the code at a breakpoint
+    def trap(self, position: int, mem: bytearray, cell_ptr: int, func: Dict, depth: int) -> None:
+        self.header[PAUSED] = 1
+        self.header[TARGET_DEPTH] = -1
+        self.resumed.clear()
+        self.step(position, mem, cell_ptr, func, depth)
+
+    # Pauses the code once it has reached the op it was stepped to
+    # Publishes the current command and memory and enacts delay, then blocks while paused
+    def step(self, position: int, mem: bytearray, cell_ptr: int, func: Dict, depth: int) -> None:
+        header = self.header
+        if header[PAUSED] and 0 <= depth <= header[TARGET_DEPTH]:
+            header[TARGET_DEPTH] = -1
+            self.resumed.clear()
+        delay = header[DELAY]
+        waiting = not self.resumed.is_set()
+        if delay or waiting:
+            self.outputs.flush()
+            self.state.snapshot(position, mem, cell_ptr, func, depth, self.positions)
+        if delay:
+            sleep(delay / 20)
+        if waiting:
+            header[PAUSED_DEPTH] = depth
+            while True:
+                self.resumed.wait()
+                if not header[SCRUB] and not header[SAVE]:
+                    break
+
+                # Shows the point in history or saves the session as the IDE asked, then waits again unless it was resumed meanwhile
+                self.resumed.clear()
+                if header[SAVE]:
+                    header[SAVE] = 0
+                    if self.checkpointer is not None:
+                        self.checkpointer.save()
+                if header[SCRUB]:
+                    header[SCRUB] = 0
+                    if header[REWIND]:
+                        self.rewind()
+                    else:
+                        self.state.snapshot(position, mem, cell_ptr, func, depth, self.positions)
+                if not header[PAUSED] or header[TARGET_DEPTH] >= 0 or header[SCRUB] or header[SAVE]:
+                    self.resumed.set()
+            header[REWIND] = 0
+
+    # Publishes the state from REWIND ops ago, going no further back than the trace can rebuild
+    # Nothing is traced until the code is first paused or stepped, so there is no history to show when it has just stopped at a breakpoint
+    def rewind(self) -> None:
+        header = self.header
+        records = self.trace.ordered() if self.trace is not None else None
+        steps = int((records["kind"] == STEP).sum()) if records is not None else 0
+        if not steps:
+            header[REWIND] = 0
+            return
+        trace = self.trace
+        back = min(int(header[REWIND]), steps - 1)
+        while True:
+            i = trace.find(records, back)
+            depth = int(records["depth"][i])
+            mem = trace.tape(records, i, depth)
+            if mem is not None or back == 0:
+                break
+            back -= 1
+        header[REWIND] = back
+        position = int(records["position"][i])
+        if depth:
+            self.state.snapshot(position, trace.tape(records, i, 0), trace.pointer(records, i, 0), None, 0)
+        self.state.snapshot(position, mem, int(records["cell_ptr"][i]), None, depth)
+
+
+# Body of the worker process, which runs each programme it is sent and reports back everything it outputs
+# Outputs are sent in batches as they happen and errors once they happen, followed by the hotness when profiling, then the time taken
+def serve(name: str, jobs: Queue, results: Queue, resumed: Event) -> None:
+    state = SharedState(name)
+    while True:
+        bf, inputs, profiling = jobs.get()
+        st = time()
+        outputs = OutputBatch(results)
+        profile = Profile() if profiling else None
+        trace = None if profiling else Trace()
+        checkpointer = None if profiling else Checkpointer(path=SESSION_FILE)
+        debugger = None if profiling else RemoteSession(state, resumed, outputs, trace, checkpointer)
+        try:
+            for _ in execute_stream(bf, inputs, profile=profile, debugger=debugger, trace=trace, checkpointer=checkpointer, outputs=outputs):
+                pass
+        except Exception as e:
+            outputs.flush()
+            results.put(("error", e))
+        outputs.flush()
+        if profiling:
+            results.put(("profile", profile.hotness()))
+        results.put(("done", time() - st))
+
+
+# Runs programmes for the IDE in a separate process, so a busy programme never holds the GIL the UI needs
+# A run is cancelled by terminating the process outright, after which a fresh one is started for the next run
+class Worker:
+
+    def __init__(self) -> None:
+        self.state = SharedState()
+        self.busy = False
+        self.spawn()
+
+    # Starts a new process along with the queues and event it talks through, as terminating one can leave them broken
+    def spawn(self) -> None:
+        self.jobs = Queue()
+        self.results = Queue()
+        self.resumed = Event()
+        self.resumed.set()
+        self.process = Process(target=serve, args=(self.state.name, self.jobs, self.results, self.resumed), daemon=True)
+        self.process.start()
+
+    # Hands a programme to the worker, cancelling whatever it is already running
+    def submit(self, bf: str, inputs: Iterable = tuple(), profiling: bool = False) -> None:
+        if self.busy:
+            self.kill()
+        self.state.header[PAUSED] = 0
+        self.state.header[TARGET_DEPTH] = -1
+        self.state.header[REWIND] = 0
+        self.state.header[SCRUB] = 0
+        self.state.header[SAVE] = 0
+        self.resumed.set()
+        self.busy = True
+        self.jobs.put((bf, inputs if isinstance(inputs, bytes) else tuple(inputs), profiling))
+
+    # Collects up to limit messages sent by the worker without blocking, marking it idle once the run is done
+    def poll(self, limit: int = 4096) -> List[Tuple[str, object]]:
+        messages = []
+        while len(messages) < limit:
+            try:
+                message = self.results.get_nowait()
+            except Empty:
+                break
+            messages.append(message)
+            if message[0] == "done":
+                self.busy = False
+        return messages
+
+    # Immediately cancels the running programme by terminating the process, and starts a fresh one
+    def kill(self) -> None:
+        self.process.terminate()
+        self.process.join()
+        self.busy = False
+        self.spawn()
+
+    # Terminates the process and frees the shared memory
+    def close(self) -> None:
+        self.process.terminate()
+        self.process.join()
+        self.state.close(unlink=True)